@@ -27,8 +27,6 @@ def backtest(df, lag=0, leverage_map=None):
             - BH_Cumulative: Buy & Hold cumulative value
             - Strategy_Cumulative: Strategy cumulative value
     """
-    df = df.copy()
-    
     # Default leverage map
     if leverage_map is None:
         leverage_map = {
@@ -40,25 +38,32 @@ def backtest(df, lag=0, leverage_map=None):
     # Determine position based on State or Signal_Modified
     if 'State' in df.columns:
         # Map states to positions
-        df['Position'] = df['State'].map(leverage_map)
+        position = df['State'].map(leverage_map).to_numpy(dtype=float)
         # Fill any unmapped states with default (2.0)
-        df['Position'].fillna(2.0, inplace=True)
+        position = np.nan_to_num(position, nan=2.0)
     elif 'Signal_Modified' in df.columns:
         # Binary signal: 1 = RED (1x), 0 = GREEN (2x)
-        df['Position'] = np.where(df['Signal_Modified'] == 1, 1.0, 2.0)
+        position = np.where(df['Signal_Modified'].to_numpy() == 1, 1.0, 2.0)
     else:
         raise ValueError("DataFrame must have either 'State' or 'Signal_Modified' column")
     
     # Apply lag: shift position forward by N days
     if lag > 0:
-        df['Position'] = df['Position'].shift(-lag)
         # Fill end with default position (2.0 = GREEN)
-        df['Position'].fillna(2.0, inplace=True)
+        shifted = np.full(len(position), 2.0)
+        shifted[:max(len(position) - lag, 0)] = position[lag:]
+        position = shifted
     
     # Calculate returns
-    df['Strategy_Return'] = df['Return'] * df['Position']
-    df['BH_Cumulative'] = (1 + df['Return']/100).cumprod()
-    df['Strategy_Cumulative'] = (1 + df['Strategy_Return']/100).cumprod()
+    returns = df['Return'].to_numpy(dtype=float)
+    strategy_return = returns * position
+    # New frame with the result columns (input df is not modified)
+    df = df.assign(
+        Position=position,
+        Strategy_Return=strategy_return,
+        BH_Cumulative=np.cumprod(1 + returns/100),
+        Strategy_Cumulative=np.cumprod(1 + strategy_return/100)
+    )
     
     # Summary stats
     final_bh = df['BH_Cumulative'].iloc[-1]
@@ -18,7 +18,7 @@ def calculate_derivative(ccdf_data, min_derivative=-10.0):
         
     Returns:
         dict with same keys as ccdf_data
-        Each value is tuple of (x_mid, derivative) arrays
+        Each value is tuple of (x_mid, derivative) float32 arrays
     """
     results = {}
     
@@ -36,22 +36,18 @@ def calculate_derivative(ccdf_data, min_derivative=-10.0):
             results[state] = (np.array([]), np.array([]))
             continue
         
-        # Convert to log space
-        log_x = np.log(x_valid)
-        log_y = np.log(y_valid)
+        # Convert to log space and take d(log y)/d(log x) in one pass
+        # (in float64 - the stored results below are float32)
+        log_xy = np.log(np.stack([x_valid, y_valid]), dtype=np.float64)
+        d_log_x, d_log_y = np.diff(log_xy, axis=1)
         
-        # Calculate derivative: d(log y)/d(log x)
-        # Use midpoints for x values
-        d_log_y = np.diff(log_y)
-        d_log_x = np.diff(log_x)
-        
-        # Avoid division by zero
-        nonzero_mask = d_log_x != 0
+        # Avoid division by zero (flat steps keep a derivative of 0)
         derivative = np.zeros(len(d_log_x))
-        derivative[nonzero_mask] = d_log_y[nonzero_mask] / d_log_x[nonzero_mask]
+        np.divide(d_log_y, d_log_x, out=derivative, where=d_log_x != 0)
         
         # Midpoint x values
-        x_mid = (x_valid[:-1] + x_valid[1:]) / 2
+        x_mid = np.add(x_valid[:-1], x_valid[1:])
+        x_mid *= 0.5
         
         # Filter out extreme derivatives (tail noise)
         if min_derivative is not None:
@@ -59,7 +55,7 @@ def calculate_derivative(ccdf_data, min_derivative=-10.0):
             x_mid = x_mid[valid_deriv]
             derivative = derivative[valid_deriv]
         
-        results[state] = (x_mid, derivative)
+        results[state] = (x_mid.astype(np.float32), derivative.astype(np.float32))
     
     print(f"✓ Derivatives calculated:")
     for state in sorted(ccdf_data.keys()):
@@ -0,0 +1,152 @@
+"""
+Actual vs Predicted CCDF Gap
+
+For a span of days, the average gap between the actual share of the last
+60 days with |return| >= each threshold and the share the 60-day power law
+tail fit predicts (negative = fewer moves than the power law expects). The
+tail is fit by least squares on the log-log CCDF, or with estimator='hill' by
+the Hill (MLE) estimator. Shared by the compression test scripts and
+print_results_table; every 60-day window is fit in one
+vectorized pass, so many spans cost about as much as one. The per-day gaps of
+a whole series are kept on disk under cache/, so re-runs skip the fit.
+"""
+import hashlib
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from load_data import write_atomic, UNREADABLE_CACHE_ERRORS
+
+CACHE_DIR = 'cache'
+
+
+def _exceedance_shares(abs_returns, thresholds):
+    """(windows, thresholds) share of each 60-day window with |return| >= threshold; row j covers days j..j+59"""
+    # Running exceedance counts, so every window is one subtraction per threshold
+    counts = np.cumsum(abs_returns[:, None] >= thresholds, axis=0)
+    counts = np.concatenate([np.zeros((1, len(thresholds)), dtype=counts.dtype), counts])
+    return (counts[60:] - counts[:-60]) / 60
+
+
+def _daily_gaps(sorted_windows, actual_pct, thresholds, min_return=0.5, min_points=5):
+    """Log-log tail fit per descending-sorted 60-day row against its actual CCDF shares; returns summed actual - predicted over thresholds and fit mask"""
+    n = sorted_windows.shape[1]
+    # The tail is a prefix of every row: CCDF ranks 1..k out of n
+    in_tail = sorted_windows > min_return
+    counts = in_tail.sum(axis=1)
+    fitted = counts >= min_points
+    gap_sums = np.zeros(len(sorted_windows))
+    if not fitted.any():
+        return gap_sums, fitted
+    counts, in_tail, sorted_windows, actual_pct = counts[fitted], in_tail[fitted], sorted_windows[fitted], actual_pct[fitted]
+    
+    # Closed-form least squares from masked row sums (same line as np.polyfit per row)
+    log_x = np.log(np.where(in_tail, sorted_windows, 1.0))
+    log_y = np.where(in_tail, np.log(np.arange(1, n + 1) / n), 0.0)
+    sx = log_x.sum(axis=1)
+    sy = log_y.sum(axis=1)
+    sxx = np.einsum('ij,ij->i', log_x, log_x)
+    sxy = np.einsum('ij,ij->i', log_x, log_y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (counts * sxy - sx * sy) / (counts * sxx - sx * sx)
+    intercept = (sy - slope * sx) / counts
+    alpha = -slope
+    
+    # (days, thresholds) matrices
+    # exp(intercept - alpha * log t): one exp over the matrix instead of a pow per entry
+    predicted_pct = np.exp(intercept[:, None] - alpha[:, None] * np.log(thresholds))
+    gap_sums[fitted] = (actual_pct - predicted_pct).sum(axis=1)
+    return gap_sums, fitted
+
+
+def _daily_hill_gaps(windows, actual_pct, thresholds, min_return=0.5, min_points=5):
+    """Hill (MLE) fit per 60-day row against its actual CCDF shares; returns summed actual - predicted over thresholds and fit mask
+    
+    alpha = k / sum(log(x / min_return)) over the k tail values, and
+    intercept = log(k / n) + alpha * log(min_return), so exp(intercept) * x**(-alpha)
+    is the unconditional CCDF. Rows need not be sorted.
+    """
+    n = windows.shape[1]
+    in_tail = windows > min_return
+    counts = in_tail.sum(axis=1)
+    log_sums = np.log(np.where(in_tail, windows, min_return) / min_return).sum(axis=1)
+    fitted = counts >= min_points
+    gap_sums = np.zeros(len(windows))
+    if not fitted.any():
+        return gap_sums, fitted
+    counts, log_sums, actual_pct = counts[fitted], log_sums[fitted], actual_pct[fitted]
+    alpha = counts / log_sums
+    intercept = np.log(counts / n) + alpha * np.log(min_return)
+    
+    predicted_pct = np.exp(intercept[:, None] - alpha[:, None] * np.log(thresholds))
+    gap_sums[fitted] = (actual_pct - predicted_pct).sum(axis=1)
+    return gap_sums, fitted
+
+
+def _series_daily_gaps(abs_returns, thresholds, estimator='ols'):
+    """Daily gaps for every 60-day window of a series (row j = the 60 days before day j + 60), cached on disk"""
+    if estimator not in ('ols', 'hill'):
+        raise ValueError(f"Unknown estimator: {estimator!r} (expected 'ols' or 'hill')")
+    
+    # Keyed on the data, the thresholds, the estimator and this module, so edits to the fit invalidate it
+    digest = hashlib.blake2b(abs_returns.tobytes(), digest_size=8)
+    digest.update(thresholds.tobytes())
+    digest.update(estimator.encode())
+    digest.update(repr(os.path.getmtime(__file__)).encode())
+    cache_path = os.path.join(CACHE_DIR, f'ccdf_gap_{digest.hexdigest()}.npz')
+    
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cached:
+                return cached['gap_sums'], cached['fitted']
+        except UNREADABLE_CACHE_ERRORS:
+            pass  # Refit and overwrite it
+    
+    actual_pct = _exceedance_shares(abs_returns, thresholds)
+    if estimator == 'hill':
+        gap_sums, fitted = _daily_hill_gaps(sliding_window_view(abs_returns, 60), actual_pct, thresholds)
+    else:
+        windows = np.sort(sliding_window_view(abs_returns, 60), axis=1)[:, ::-1]
+        gap_sums, fitted = _daily_gaps(windows, actual_pct, thresholds)
+    
+    write_atomic(cache_path, lambda tmp_file: np.savez(tmp_file, gap_sums=gap_sums, fitted=fitted))
+    return gap_sums, fitted
+
+
+def batch_actual_vs_predicted(df, spans, thresholds=[0.5, 1.0, 1.5, 2.0], estimator='ols'):
+    """
+    Mean daily actual - predicted CCDF gap for each (start_idx, end_idx) span, from one pass over the data.
+    
+    Args:
+        df: DataFrame with a Return column
+        spans: Array of (start_idx, end_idx) day ranges, shape (..., 2)
+        thresholds: |return| thresholds the gap is averaged over
+        estimator: 'ols' (log-log least squares) or 'hill' for the tail fit
+        
+    Returns:
+        Array of shape spans.shape[:-1]: the gap averaged over the fitted days
+        and thresholds of each span; NaN when a span has no fitted day or
+        contains a degenerate fit
+    """
+    abs_returns = np.abs(df['Return'].to_numpy(dtype=float))
+    thresholds = np.asarray(thresholds, dtype=float)
+    spans = np.asarray(spans, dtype=np.int64)
+    if len(abs_returns) < 60:
+        return np.full(spans.shape[:-1], np.nan)
+    
+    # Prefix sums over days 60..N, so each span is two lookups; a degenerate
+    # fit (NaN gap) makes every span containing it NaN, as np.mean would
+    gap_sums, fitted = _series_daily_gaps(abs_returns, thresholds, estimator)
+    bad = np.isnan(gap_sums)
+    cum_gaps = np.concatenate([[0.0], np.cumsum(np.where(bad, 0.0, gap_sums))])
+    cum_fitted = np.concatenate([[0], np.cumsum(fitted)])
+    cum_bad = np.concatenate([[0], np.cumsum(bad)])
+    
+    lo = np.clip(spans[..., 0], 60, None) - 60
+    hi = np.clip(spans[..., 1] - 60, lo, len(gap_sums))
+    n_fitted = cum_fitted[hi] - cum_fitted[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gaps = (cum_gaps[hi] - cum_gaps[lo]) / (n_fitted * len(thresholds))
+    gaps[(n_fitted == 0) | (cum_bad[hi] > cum_bad[lo])] = np.nan
+    return gaps
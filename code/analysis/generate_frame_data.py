@@ -3,25 +3,9 @@ sys.path.append('code/data')
 sys.path.append('code/analysis')
 from load_data import load_asset
 from synthetic_vix import calculate_synthetic_vix
+from fit_quality import rolling_tail_fit
 import numpy as np
-import pickle
-
-def calculate_alpha(returns, min_return=0.5):
-    """Calculate power law alpha from returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < 10:
-        return None, None, None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
-    return x, y, alpha, intercept
+from numpy.lib.stride_tricks import sliding_window_view
 
 # Load SPX
 print("Loading SPX data...")
@@ -32,33 +16,46 @@ df = calculate_synthetic_vix(df, window=21)
 window = 60
 print(f"Calculating {window}-day rolling CCDFs...")
 
-frames_data = []
-for i in range(window, len(df), 20):  # Every 20 days instead of 5
-    returns = df.iloc[i-window:i]['Return'].values
-    x, y, alpha, intercept = calculate_alpha(returns)
-    
-    if alpha is not None:
-        # Calculate power law fit at same x points
-        power_law_fit = np.exp(intercept) * (x ** (-alpha))
-        
-        # Calculate deviation
-        deviation = y - power_law_fit
-        
-        frames_data.append({
-            'date': df.iloc[i]['Date'],
-            'x': x,
-            'actual_ccdf': y,
-            'power_law': power_law_fit,
-            'deviation': deviation,
-            'alpha': alpha,
-            'vix': df.iloc[i]['SyntheticVIX'],
-            'price': df.iloc[i]['Close']
-        })
+returns = df['Return'].values
+slope, intercept, _ = rolling_tail_fit(returns, window)
+
+# Frame days: every 20 days, keeping only those with a valid tail fit
+frame_idx = np.arange(window, len(df), 20)  # Every 20 days instead of 5
+frame_idx = frame_idx[~np.isnan(slope[frame_idx])]
+alpha = -slope[frame_idx]
+intercept = intercept[frame_idx]
+
+# Sorted (descending) CCDF of each frame's window, tail > 0.5% only
+windows = sliding_window_view(np.abs(returns), window)[frame_idx - window]
+sorted_returns = np.sort(windows, axis=1)[:, ::-1]
+ccdf = np.arange(1, window+1) / window
+tail_mask = sorted_returns > 0.5
+
+# Frames are stored column-wise: one array per field, with the per-frame
+# CCDF curves NaN-padded to the window length (n_points gives the length)
+x = np.where(tail_mask, sorted_returns, np.nan)
+actual_ccdf = np.where(tail_mask, ccdf, np.nan)
+
+# Calculate power law fit at same x points
+power_law = np.exp(intercept[:, None]) * (x ** (-alpha[:, None]))
+
+# Calculate deviation
+deviation = actual_ccdf - power_law
 
-print(f"Generated {len(frames_data)} frames")
+print(f"Generated {len(frame_idx)} frames")
 
 # Save frame data
-with open('animation_frames/frame_data.pkl', 'wb') as f:
-    pickle.dump(frames_data, f)
+np.savez_compressed(
+    'animation_frames/frame_data.npz',
+    date=df['Date'].values[frame_idx].astype('datetime64[D]'),
+    alpha=alpha,
+    vix=df['SyntheticVIX'].values[frame_idx],
+    price=df['Close'].values[frame_idx],
+    n_points=tail_mask.sum(axis=1).astype(np.int64),
+    x=x,
+    actual_ccdf=actual_ccdf,
+    power_law=power_law,
+    deviation=deviation
+)
 
 print("✓ Saved frame data")
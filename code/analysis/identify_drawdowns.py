@@ -15,77 +15,131 @@ def identify_drawdowns(df, threshold_pct=15):
     - peak_idx, trough_idx: Indices
     """
     # Calculate running max
-    df['Running_Max'] = df['Close'].expanding().max()
-    df['Drawdown'] = (df['Close'] - df['Running_Max']) / df['Running_Max'] * 100
+    close = df['Close'].to_numpy(dtype=float)
+    running_max = np.maximum.accumulate(close)
+    drawdown = (close - running_max) / running_max * 100
+    df['Running_Max'] = running_max
+    df['Drawdown'] = drawdown
+    dates = df['Date'].to_numpy()
+    
+    # Candidate days for each transition, found once up front
+    new_highs = np.flatnonzero(close >= running_max)   # New all-time highs
+    crossed = np.flatnonzero(drawdown <= -threshold_pct)  # Crossed threshold
+    recovered = np.flatnonzero(drawdown > -threshold_pct * 0.5)  # Recovered 50% of drawdown
     
     drawdowns = []
-    in_drawdown = False
     current_peak_idx = 0
+    i = 1  # First day not yet scanned (outside any drawdown)
     
-    for i in range(1, len(df)):
-        # New all-time high - potential peak
-        if df.iloc[i]['Close'] >= df.iloc[i]['Running_Max']:
-            if not in_drawdown:
-                current_peak_idx = i
+    while True:
+        # Next threshold crossing
+        j = np.searchsorted(crossed, i)
+        if j == len(crossed):
+            break
+        entry = crossed[j]
+        
+        # Latest all-time high since the last drawdown - potential peak
+        h = np.searchsorted(new_highs, entry) - 1
+        if h >= 0 and new_highs[h] >= i:
+            current_peak_idx = new_highs[h]
         
-        # Check if we crossed threshold
-        if df.iloc[i]['Drawdown'] <= -threshold_pct and not in_drawdown:
-            in_drawdown = True
-            # Find the actual peak before this drawdown
-            # Look back from current position to find local max
-            lookback_start = max(0, current_peak_idx - 252)  # Look back up to 1 year
-            window = df.iloc[lookback_start:i+1]
-            peak_idx = window['Close'].idxmax()
-            current_peak_idx = peak_idx
+        # Find the actual peak before this drawdown
+        # Look back from current position to find local max
+        lookback_start = max(0, current_peak_idx - 252)  # Look back up to 1 year
+        current_peak_idx = lookback_start + int(np.argmax(close[lookback_start:entry+1]))
         
         # Exiting drawdown (price recovering)
-        if in_drawdown and df.iloc[i]['Drawdown'] > -threshold_pct * 0.5:  # Recovered 50% of drawdown
-            # Find the trough
-            trough_window = df.iloc[current_peak_idx:i+1]
-            trough_idx = trough_window['Drawdown'].idxmin()
-            
-            drawdown_size = df.iloc[trough_idx]['Drawdown']
-            
-            drawdowns.append({
-                'peak_date': df.iloc[current_peak_idx]['Date'],
-                'trough_date': df.iloc[trough_idx]['Date'],
-                'drawdown_pct': drawdown_size,
-                'peak_idx': current_peak_idx,
-                'trough_idx': trough_idx
-            })
-            
-            in_drawdown = False
+        r = np.searchsorted(recovered, entry, side='right')
+        if r == len(recovered):
+            break
+        exit_idx = recovered[r]
+        
+        # Find the trough
+        trough_idx = current_peak_idx + int(np.argmin(drawdown[current_peak_idx:exit_idx+1]))
+        
+        drawdowns.append({
+            'peak_date': pd.Timestamp(dates[current_peak_idx]),
+            'trough_date': pd.Timestamp(dates[trough_idx]),
+            'drawdown_pct': drawdown[trough_idx],
+            'peak_idx': current_peak_idx,
+            'trough_idx': trough_idx
+        })
+        
+        i = exit_idx + 1
     
     return drawdowns
 
-# Test on SPX
-print("Testing drawdown identification on SPX...")
-df = load_asset('_spx_d.csv')
 
-drawdowns = identify_drawdowns(df, threshold_pct=15)
+def identify_unique_drawdowns(df, threshold_pct=15):
+    """Identify drawdowns, removing duplicates"""
+    close = df['Close'].to_numpy(dtype=np.float64)
+    running_max = np.maximum.accumulate(close)
+    df['Running_Max'] = running_max
+    drawdown = (close - running_max) / running_max * 100
+    df['Drawdown'] = drawdown
+    dates = df['Date'].to_numpy()
+    
+    # Troughs below threshold: entry and exit candidates, found once up front
+    crossed = np.flatnonzero(drawdown <= -threshold_pct)
+    recovered = np.flatnonzero(drawdown > -threshold_pct * 0.5)
+    
+    # First drawdown seen for each trough, in scan order
+    troughs = {}
+    i = 0
+    while True:
+        j = np.searchsorted(crossed, i)
+        if j == len(crossed):
+            break
+        start = crossed[j]
+        
+        # First recovered day after entry, or end of data
+        r = np.searchsorted(recovered, start)
+        exit_idx = recovered[r] if r < len(recovered) else len(close)
+        
+        trough_idx = start + int(np.argmin(drawdown[start:exit_idx+1]))
+        
+        # Find peak before this trough
+        peak_start = max(0, trough_idx-756)  # Look back up to 3 years
+        peak_idx = peak_start + int(np.argmax(close[peak_start:trough_idx]))
+        
+        troughs.setdefault(trough_idx, {
+            'peak_date': pd.Timestamp(dates[peak_idx]),
+            'trough_date': pd.Timestamp(dates[trough_idx]),
+            'drawdown_pct': drawdown[trough_idx],
+            'peak_idx': peak_idx,
+            'trough_idx': trough_idx
+        })
+        i = exit_idx + 1
+    
+    return list(troughs.values())
+
+
+if __name__ == '__main__':
+    # Test on SPX
+    print("Testing drawdown identification on SPX...")
+    df = load_asset('_spx_d.csv')
 
-print(f"\nFound {len(drawdowns)} drawdowns >= 15%:")
-for dd in drawdowns:
-    print(f"  Peak: {dd['peak_date'].strftime('%Y-%m-%d')} -> Trough: {dd['trough_date'].strftime('%Y-%m-%d')} ({dd['drawdown_pct']:.1f}%)")
+    drawdowns = identify_drawdowns(df, threshold_pct=15)
 
-# Check if we captured known bear markets
-known_bears = {
-    '1929 Crash': ('1929-08-01', '1932-07-01'),
-    '1937 Recession': ('1937-03-01', '1938-04-01'),
-    '1973-74 Bear': ('1973-01-01', '1974-12-01'),
-    '2000 Dot-com': ('2000-03-01', '2002-10-01'),
-    '2008 Financial': ('2007-10-01', '2009-03-01'),
-}
+    print(f"\nFound {len(drawdowns)} drawdowns >= 15%:")
+    for dd in drawdowns:
+        print(f"  Peak: {dd['peak_date'].strftime('%Y-%m-%d')} -> Trough: {dd['trough_date'].strftime('%Y-%m-%d')} ({dd['drawdown_pct']:.1f}%)")
 
-print("\nChecking known bear markets:")
-for name, (start, end) in known_bears.items():
-    start_date = pd.to_datetime(start)
-    end_date = pd.to_datetime(end)
-    
-    captured = any(
-        pd.to_datetime(dd['peak_date']) <= end_date and 
-        pd.to_datetime(dd['trough_date']) >= start_date
-        for dd in drawdowns
-    )
-    print(f"  {name}: {'✓ CAPTURED' if captured else '✗ MISSED'}")
+    # Check if we captured known bear markets
+    known_bears = {
+        '1929 Crash': ('1929-08-01', '1932-07-01'),
+        '1937 Recession': ('1937-03-01', '1938-04-01'),
+        '1973-74 Bear': ('1973-01-01', '1974-12-01'),
+        '2000 Dot-com': ('2000-03-01', '2002-10-01'),
+        '2008 Financial': ('2007-10-01', '2009-03-01'),
+    }
 
+    print("\nChecking known bear markets:")
+    peaks = np.array([dd['peak_date'] for dd in drawdowns], dtype='datetime64[ns]')
+    troughs = np.array([dd['trough_date'] for dd in drawdowns], dtype='datetime64[ns]')
+    for name, (start, end) in known_bears.items():
+        start_date = np.datetime64(start)
+        end_date = np.datetime64(end)
+        
+        captured = ((peaks <= end_date) & (troughs >= start_date)).any()
+        print(f"  {name}: {'✓ CAPTURED' if captured else '✗ MISSED'}")
@@ -0,0 +1,54 @@
+"""
+Power Law Tail Fit
+
+Log-log least-squares line and the single-window CCDF tail fit built on it,
+shared by the modules that fit one window or one CCDF at a time. Rolling
+scans over a whole series should use fit_quality.rolling_tail_fit /
+rolling_mean_deviation, which fit every window in one vectorized pass.
+"""
+import numpy as np
+
+
+def fit_line(log_x, log_y):
+    """
+    Least-squares line through (log_x, log_y).
+    
+    Closed-form replacement for np.polyfit(log_x, log_y, 1) - same result
+    without building a Vandermonde matrix and calling lstsq.
+    
+    Returns:
+        (slope, intercept)
+    """
+    n = log_x.size
+    sx = log_x.sum()
+    sy = log_y.sum()
+    sxx = np.dot(log_x, log_x)
+    sxy = np.dot(log_x, log_y)
+    slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+    intercept = (sy - slope * sx) / n
+    return slope, intercept
+
+def calculate_alpha(returns, min_return=0.5, min_points=5):
+    """
+    Calculate power law alpha from returns.
+
+    Args:
+        returns: Array of returns (one window)
+        min_return: Minimum |return| for the tail fit
+        min_points: Minimum tail points required for a fit
+
+    Returns:
+        (x, y, alpha, intercept): tail |returns| in descending order, their
+        CCDF, and the fitted line log(y) = intercept - alpha * log(x);
+        all None if the tail has fewer than min_points values
+    """
+    # Only the tail (|r| > min_return) feeds the fit, so only it is sorted; as the
+    # top of the descending order its CCDF ranks are 1..k out of n
+    abs_returns = np.abs(returns)
+    n = len(abs_returns)
+    x = np.sort(abs_returns[abs_returns > min_return])[::-1]
+    if len(x) < min_points:
+        return None, None, None, None
+    y = np.arange(1, len(x) + 1) / n
+    slope, intercept = fit_line(np.log(x), np.log(y))
+    return x, y, -slope, intercept
@@ -0,0 +1,81 @@
+"""
+Rolling Mean Deviation Cache
+
+The deviation-cross plots all start from the same frame: an asset, its 21-day
+synthetic VIX and the 60-day rolling mean CCDF deviation. get_mean_deviation
+builds that frame once and keeps it on disk under cache/ and in memory, so
+re-running a plot while tuning its cosmetics, or producing several plots in one
+process, skips the load and the rolling fit.
+"""
+import hashlib
+import os
+
+import pandas as pd
+
+import load_data
+from load_data import load_asset, find_asset_file, write_atomic, UNREADABLE_CACHE_ERRORS
+import fit_quality
+import synthetic_vix
+
+CACHE_DIR = 'cache'
+COLUMNS = ['Date', 'Close', 'Return', 'SyntheticVIX', 'Mean_Deviation']
+
+# Frames already built or read in this process, by cache key
+_MEMORY = {}
+
+
+def _cache_key(filepath, args):
+    """Hash of the source CSV, the code that parses and fits it, the pandas that pickles it, and the call arguments"""
+    # mtimes invalidate the entry when the data, the parser or the fitting code changes
+    stamps = [os.path.getmtime(path) for path in
+              (filepath, load_data.__file__, __file__, fit_quality.__file__, synthetic_vix.__file__)]
+    return hashlib.blake2b(repr((stamps, pd.__version__, args)).encode(), digest_size=8).hexdigest()
+
+
+def _read_cached(cache_path):
+    """Cached frame, or None if there is no readable entry"""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        return pd.read_pickle(cache_path)
+    except UNREADABLE_CACHE_ERRORS:
+        return None  # Rebuild and overwrite it
+
+
+def get_mean_deviation(asset, window=60, min_date='1990-01-01', min_points=5,
+                       low=0.5, high=3.0, vix_window=21):
+    """
+    Asset frame with the rolling mean CCDF deviation, cached on disk.
+
+    Args:
+        asset: CSV filename, as passed to load_asset
+        window: Rolling window size in days
+        min_date: Passed to load_asset (None for its automatic filter)
+        min_points: Minimum tail points required for a fit
+        low, high: Return-magnitude band the deviation is averaged over
+        vix_window: Window of the synthetic VIX
+
+    Returns:
+        DataFrame with columns: Date, Close, Return, SyntheticVIX, Mean_Deviation
+    """
+    filepath = find_asset_file(asset)
+    key = _cache_key(filepath, (asset, window, min_date, min_points, low, high, vix_window))
+    cache_path = os.path.join(CACHE_DIR, f'mean_dev_{key}.pkl')
+
+    if key in _MEMORY:
+        return _MEMORY[key].copy()
+
+    df = _read_cached(cache_path)
+    if df is not None:
+        print(f"✓ Loaded cached {window}-day mean deviation for {asset}: {len(df):,} days")
+    else:
+        df = load_asset(asset, min_date=min_date)
+        df = synthetic_vix.calculate_synthetic_vix(df, window=vix_window)
+        df['Mean_Deviation'] = fit_quality.rolling_mean_deviation(
+            df['Return'].to_numpy(), window, min_points=min_points, low=low, high=high)
+        df = df[COLUMNS]
+        write_atomic(cache_path, df.to_pickle)
+
+    # Callers add their own columns, so each gets a copy of the shared frame
+    _MEMORY[key] = df
+    return df.copy()
@@ -13,6 +13,97 @@ import pandas as pd
 import numpy as np
 
 
+def rolling_mean(x, window, min_periods=None):
+    """
+    Trailing mean, same alignment as pandas rolling().mean().
+
+    Cumulative sum differenced at lag window; the first window-1 values, and any
+    window containing NaN, are NaN. With min_periods (as in pandas), the mean
+    is over the defined values of each window, including the shorter windows at
+    the start, and is NaN only where fewer than min_periods are defined.
+
+    Args:
+        x: 1-D array of values
+        window: Window length
+        min_periods: Minimum defined values per window (None = full windows only)
+
+    Returns:
+        np.ndarray of len(x)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if window < 1 or len(x) == 0 or (min_periods is None and len(x) < window):
+        return out
+
+    missing = np.isnan(x)
+    c1 = np.concatenate([[0.0], np.cumsum(np.where(missing, 0.0, x))])
+    cn = np.concatenate([[0], np.cumsum(missing)])
+    if min_periods is not None:
+        end = np.arange(1, len(x) + 1)
+        start = np.maximum(end - window, 0)
+        count = (end - start) - (cn[end] - cn[start])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = (c1[end] - c1[start]) / count
+        out[count < max(min_periods, 1)] = np.nan
+        return out
+    mean = (c1[window:] - c1[:-window]) / window
+    mean[(cn[window:] - cn[:-window]) > 0] = np.nan
+    out[window - 1:] = mean
+    return out
+
+
+def rolling_std(x, window):
+    """
+    Trailing sample standard deviation (ddof=1), same alignment as pandas rolling().std().
+    
+    Uses running sums of x and x**2 (cumulative sums differenced at lag window) on
+    mean-centred data, so each output costs O(1) instead of a window scan. The first
+    window-1 values, and any window containing NaN, are NaN.
+    
+    Args:
+        x: 1-D array of values
+        window: Window length
+        
+    Returns:
+        np.ndarray of len(x)
+    """
+    return rolling_std_multi(x, [window])[:, 0]
+
+
+def rolling_std_multi(x, windows):
+    """
+    rolling_std for several windows at once, sharing one set of cumulative sums.
+    
+    Args:
+        x: 1-D array of values
+        windows: Sequence of window lengths
+        
+    Returns:
+        np.ndarray of shape (len(x), len(windows))
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full((len(x), len(windows)), np.nan)
+    if len(x) == 0:
+        return out
+    
+    missing = np.isnan(x)
+    # Centring keeps s2 - s1**2/window from cancelling for large means
+    centred = np.where(missing, 0.0, x - np.nanmean(x)) if not missing.all() else np.zeros(len(x))
+    c1 = np.concatenate([[0.0], np.cumsum(centred)])
+    c2 = np.concatenate([[0.0], np.cumsum(centred * centred)])
+    cn = np.concatenate([[0], np.cumsum(missing)])
+    
+    for j, window in enumerate(windows):
+        if window < 2 or len(x) < window:
+            continue
+        s1 = c1[window:] - c1[:-window]
+        s2 = c2[window:] - c2[:-window]
+        var = np.maximum(s2 - s1 * s1 / window, 0.0) / (window - 1)
+        var[(cn[window:] - cn[:-window]) > 0] = np.nan
+        out[window - 1:, j] = np.sqrt(var)
+    return out
+
+
 def calculate_synthetic_vix(df, window=21, annualize=True):
     """
     Calculate synthetic VIX from returns using rolling realized volatility.
@@ -25,18 +116,15 @@ def calculate_synthetic_vix(df, window=21, annualize=True):
     Returns:
         DataFrame with SyntheticVIX column
     """
-    df = df.copy()
-    
     # Calculate rolling standard deviation
-    rolling_std = df['Return'].rolling(window=window).std()
+    vol = rolling_std(df['Return'].to_numpy(dtype=float), window)
     
     if annualize:
         # Annualize: vol * sqrt(252 trading days)
-        rolling_std = rolling_std * np.sqrt(252)
-    
-    df['SyntheticVIX'] = rolling_std
+        vol = vol * np.sqrt(252)
     
-    return df
+    # New frame with the added column (input df is not modified)
+    return df.assign(SyntheticVIX=vol)
 
 
 def compare_with_real_vix(spx_df, vix_df, window=21):
@@ -49,19 +137,18 @@ def compare_with_real_vix(spx_df, vix_df, window=21):
         window: Rolling window for synthetic calculation
         
     Returns:
-        Merged DataFrame with both VIX measures
+        Merged DataFrame with Date, SyntheticVIX and RealVIX columns
     """
-    # Calculate synthetic VIX
-    spx_with_synthetic = calculate_synthetic_vix(spx_df, window=window)
+    # Calculate synthetic VIX on a minimal Date/SyntheticVIX frame (no copy of spx_df)
+    synthetic = rolling_std(spx_df['Return'].to_numpy(dtype=float), window) * np.sqrt(252)
+    spx_with_synthetic = pd.DataFrame({'Date': spx_df['Date'].to_numpy(), 'SyntheticVIX': synthetic})
     
     # Merge with real VIX
     merged = spx_with_synthetic.merge(
-        vix_df[['Date', 'Close']], 
-        on='Date', 
-        how='inner',
-        suffixes=('', '_VIX')
+        vix_df[['Date', 'Close']].rename(columns={'Close': 'RealVIX'}),
+        on='Date',
+        how='inner'
     )
-    merged = merged.rename(columns={'Close_VIX': 'RealVIX'})
     
     # Calculate correlation
     correlation = merged[['SyntheticVIX', 'RealVIX']].corr().iloc[0, 1]
@@ -83,6 +170,55 @@ def compare_with_real_vix(spx_df, vix_df, window=21):
     return merged, stats
 
 
+def sweep_windows(spx_df, vix_df, windows, annualize=True):
+    """
+    compare_with_real_vix stats for several windows with a single date merge.
+    
+    Args:
+        spx_df: SPX DataFrame with Date and Return columns
+        vix_df: VIX DataFrame with Date and Close columns
+        windows: Sequence of rolling windows to evaluate
+        annualize: If True, annualize volatility (multiply by sqrt(252))
+        
+    Returns:
+        dict mapping window -> stats dict (same keys as compare_with_real_vix)
+    """
+    vols = rolling_std_multi(spx_df['Return'].to_numpy(dtype=float), windows)
+    if annualize:
+        vols = vols * np.sqrt(252)
+    
+    # Merge dates once; the merge keeps SPX row positions for every window
+    rows = spx_df[['Date']].assign(_row=np.arange(len(spx_df)))
+    merged = rows.merge(vix_df[['Date', 'Close']], on='Date', how='inner')
+    synthetic = vols[merged['_row'].to_numpy()]
+    real = merged['Close'].to_numpy(dtype=float)[:, None]
+    
+    # Pairwise-complete stats per window column (NaN rows skipped, as pandas does)
+    valid = ~np.isnan(synthetic) & ~np.isnan(real)
+    n = valid.sum(axis=0)
+    s = np.where(valid, synthetic, 0.0)
+    r = np.where(valid, real, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ds = np.where(valid, s - s.sum(axis=0) / n, 0.0)
+        dr = np.where(valid, r - r.sum(axis=0) / n, 0.0)
+        correlation = (ds * dr).sum(axis=0) / np.sqrt((ds * ds).sum(axis=0) * (dr * dr).sum(axis=0))
+        diff = s - r
+        rmse = np.sqrt((diff * diff).sum(axis=0) / n)
+        mae = np.abs(diff).sum(axis=0) / n
+    
+    date_range = (merged['Date'].min(), merged['Date'].max())
+    return {
+        window: {
+            'correlation': correlation[j],
+            'rmse': rmse[j],
+            'mae': mae[j],
+            'n_days': len(merged),
+            'date_range': date_range
+        }
+        for j, window in enumerate(windows)
+    }
+
+
 if __name__ == '__main__':
     import sys
     sys.path.append('/mnt/user-data/outputs/code/data')
@@ -106,8 +242,8 @@ if __name__ == '__main__':
     best_corr = 0
     best_window = None
     
-    for window in [10, 15, 21, 30, 42, 63]:
-        merged, stats = compare_with_real_vix(spx, vix, window=window)
+    sweep = sweep_windows(spx, vix, [10, 15, 21, 30, 42, 63])
+    for window, stats in sweep.items():
         print(f"{window:<10} {stats['correlation']:<15.3f} {stats['rmse']:<10.2f} {stats['mae']:<10.2f}")
         
         if stats['correlation'] > best_corr:
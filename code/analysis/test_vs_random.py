@@ -42,7 +42,7 @@ def generate_random_signal(real_states):
     clusters.append((current_state, current_len))
     
     # Get unique states
-    unique_states = np.unique(real_states)
+    unique_states, real_codes = np.unique(real_states, return_inverse=True)
     state_to_idx = {state: i for i, state in enumerate(unique_states)}
     n_states = len(unique_states)
     
@@ -71,107 +71,96 @@ def generate_random_signal(real_states):
     # Generate new sequence using Markov resampling
     # Start with random state matching original initial distribution
     initial_state = real_states[0]
-    
-    new_sequence = []
-    current_state = initial_state
     target_length = len(real_states)
     
+    # Inverse-transform sampling: cumulative transition rows and per-state
+    # length arrays built once, uniforms drawn in bulk. Every cluster is at
+    # least one day, so target_length draws can never run out.
+    cum_trans = np.cumsum(transition_probs, axis=1)
+    lengths_by_idx = [np.array(clusters_by_state[state]) for state in unique_states]
+    u_len = np.random.random(target_length)
+    u_trans = np.random.random(target_length)
+    
+    # Built as state indices; mapped back to states after balancing
+    new_codes = np.empty(target_length, dtype=np.intp)
+    current_idx = state_to_idx[initial_state]
+    write_pos = 0
+    k = 0
+    
     # Generate until we have enough days
-    while len(new_sequence) < target_length:
+    while write_pos < target_length:
         # Sample a cluster length from this state's actual distribution
-        cluster_length = np.random.choice(clusters_by_state[current_state])
+        lengths = lengths_by_idx[current_idx]
+        cluster_length = lengths[int(u_len[k] * len(lengths))]
         
-        # Add this cluster to sequence
-        for _ in range(cluster_length):
-            new_sequence.append(current_state)
-            if len(new_sequence) >= target_length:
-                break
+        # Write this cluster, truncated at the exact length
+        take = min(cluster_length, target_length - write_pos)
+        new_codes[write_pos:write_pos + take] = current_idx
+        write_pos += take
         
         # Transition to next state using Markov probabilities
-        current_idx = state_to_idx[current_state]
-        next_state = np.random.choice(unique_states, p=transition_probs[current_idx])
-        current_state = next_state
-    
-    # Truncate to exact length
-    new_sequence = np.array(new_sequence[:target_length])
+        next_idx = np.searchsorted(cum_trans[current_idx], u_trans[k], side='right')
+        current_idx = min(next_idx, n_states - 1)
+        k += 1
     
     # Adjust counts to be within 0.5% of target (minimal swaps)
-    target_counts = {state: (real_states == state).sum() for state in unique_states}
-    actual_counts = {state: (new_sequence == state).sum() for state in unique_states}
-    
     tolerance = int(target_length * 0.005)  # 0.5% tolerance
-    
-    # Fix any state that's outside tolerance
-    for state in unique_states:
-        diff = target_counts[state] - actual_counts[state]
-        
-        if abs(diff) > tolerance:
-            # Need to adjust this state
-            if diff > 0:
-                # Need more of this state - swap from other states
-                for other_state in unique_states:
-                    if other_state == state:
-                        continue
-                    
-                    other_excess = actual_counts[other_state] - target_counts[other_state]
-                    if other_excess > tolerance:
-                        # This state has excess, swap some
-                        n_swaps = min(abs(diff), other_excess - tolerance)
-                        indices = np.where(new_sequence == other_state)[0]
-                        if len(indices) >= n_swaps:
-                            swap_indices = np.random.choice(indices, n_swaps, replace=False)
-                            new_sequence[swap_indices] = state
-                            actual_counts[state] += n_swaps
-                            actual_counts[other_state] -= n_swaps
-                            diff = target_counts[state] - actual_counts[state]
-                            
-                            if abs(diff) <= tolerance:
-                                break
-            
-            elif diff < 0:
-                # Have too many of this state - swap to states that need more
-                for other_state in unique_states:
-                    if other_state == state:
-                        continue
-                    
-                    other_deficit = target_counts[other_state] - actual_counts[other_state]
-                    if other_deficit > tolerance:
-                        # This state needs more
-                        n_swaps = min(abs(diff), other_deficit - tolerance)
-                        indices = np.where(new_sequence == state)[0]
-                        if len(indices) >= n_swaps:
-                            swap_indices = np.random.choice(indices, n_swaps, replace=False)
-                            new_sequence[swap_indices] = other_state
-                            actual_counts[state] -= n_swaps
-                            actual_counts[other_state] += n_swaps
-                            diff = target_counts[state] - actual_counts[state]
-                            
-                            if abs(diff) <= tolerance:
-                                break
+    deficits = (np.bincount(real_codes, minlength=n_states)
+                - np.bincount(new_codes, minlength=n_states))
+    receivers = np.flatnonzero(deficits > tolerance)
+    donors = np.flatnonzero(deficits < -tolerance)
+    
+    # One shuffled index pool per over-represented state, handed out in
+    # order to the states that need more (each side moved at most to target)
+    for src in donors:
+        pool = np.random.permutation(np.flatnonzero(new_codes == src))
+        available = -deficits[src]
+        used = 0
+        for dst in receivers:
+            n_swaps = min(deficits[dst], available - used)
+            if n_swaps <= 0:
+                continue
+            new_codes[pool[used:used + n_swaps]] = dst
+            deficits[dst] -= n_swaps
+            used += n_swaps
+        deficits[src] += used
+    
+    new_sequence = unique_states[new_codes]
     
     return new_sequence
 
 
+# Trial frame for this worker process, installed once by _init_trial_worker
+_TRIAL_DF = None
+
+
+def _init_trial_worker(df):
+    """Pool initializer: keep the trial frame as a per-worker global."""
+    global _TRIAL_DF
+    _TRIAL_DF = df
+
+
 def _run_single_trial(args):
     """
     Run a single random trial. Designed for parallel execution.
     
     Args:
-        args: Tuple of (df, lag, leverage_map, seed)
+        args: Tuple of (lag, leverage_map, seed); the frame itself comes
+              from _init_trial_worker so it is not pickled per trial
         
     Returns:
         float: Performance ratio for this trial
     """
-    df, lag, leverage_map, seed = args
+    lag, leverage_map, seed = args
+    df = _TRIAL_DF
     
     # Set unique seed for this worker
     np.random.seed(seed)
     
-    # Create independent copy and shuffle states
-    df_random = df.copy()
+    # Independent frame with shuffled states
     real_states = df['State'].values
     random_states = generate_random_signal(real_states)
-    df_random['State'] = random_states
+    df_random = df.assign(State=random_states)
     
     # Backtest
     df_random_bt = backtest(df_random, lag=lag, leverage_map=leverage_map)
@@ -216,11 +205,14 @@ def test_vs_random(df, lag=0, n_trials=50, leverage_map=None):
     base_seed = np.random.randint(0, 1000000)
     
     # Prepare arguments for each trial - each gets independent seed
-    trial_args = [(df, lag, leverage_map, base_seed + i) for i in range(n_trials)]
+    trial_args = [(lag, leverage_map, base_seed + i) for i in range(n_trials)]
+    
+    # Only the columns backtest needs, shipped once per worker
+    trial_df = df[['Date', 'Return', 'State']]
     
     # Run trials in parallel
     n_workers = mp.cpu_count()
-    with mp.Pool(n_workers) as pool:
+    with mp.Pool(n_workers, initializer=_init_trial_worker, initargs=(trial_df,)) as pool:
         random_ratios = pool.map(_run_single_trial, trial_args)
     
     print(f"✓ Completed {n_trials} trials using {n_workers} workers")
@@ -18,24 +18,27 @@ def run_backtest(df, initial_capital=10000):
     Returns:
         dict with results and summary statistics
     """
-    df = df.copy()
+    # Boolean filter already returns a new frame
     df = df[df['Signal'].notna()].reset_index(drop=True)
     
-    # Calculate strategy returns
+    # Strategy, cumulative and drawdown series on the raw arrays
     # Signal * Return gives position-weighted return
-    df['StrategyReturn'] = df['Signal'] * df['Return']
+    returns = df['Return'].to_numpy(dtype=float)
+    strategy_return = df['Signal'].to_numpy(dtype=float) * returns
+    cum_return = np.nancumprod(1 + returns / 100)
+    cum_strategy = np.nancumprod(1 + strategy_return / 100)
+    portfolio_value = initial_capital * cum_strategy
+    peak = np.fmax.accumulate(portfolio_value)
     
-    # Calculate cumulative returns
-    df['CumReturn'] = (1 + df['Return'] / 100).cumprod()
-    df['CumStrategyReturn'] = (1 + df['StrategyReturn'] / 100).cumprod()
-    
-    # Calculate portfolio value
-    df['PortfolioValue'] = initial_capital * df['CumStrategyReturn']
-    df['BuyHoldValue'] = initial_capital * df['CumReturn']
-    
-    # Calculate drawdown
-    df['Peak'] = df['PortfolioValue'].cummax()
-    df['Drawdown'] = (df['PortfolioValue'] - df['Peak']) / df['Peak'] * 100
+    df = df.assign(
+        StrategyReturn=strategy_return,
+        CumReturn=cum_return,
+        CumStrategyReturn=cum_strategy,
+        PortfolioValue=portfolio_value,
+        BuyHoldValue=initial_capital * cum_return,
+        Peak=peak,
+        Drawdown=(portfolio_value - peak) / peak * 100
+    )
     
     # Summary statistics
     total_return = (df['PortfolioValue'].iloc[-1] / initial_capital - 1) * 100
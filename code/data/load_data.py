@@ -4,20 +4,97 @@ Load asset data with returns calculated.
 import pandas as pd
 import numpy as np
 import os
+import pickle
+import tempfile
+import zipfile
 
-def load_asset(filename, min_date=None):
+# What reading a cache entry raises when it is truncated, corrupt, or was written by an older pandas/numpy
+UNREADABLE_CACHE_ERRORS = (OSError, EOFError, ValueError, KeyError, AttributeError, ModuleNotFoundError,
+                           TypeError, pickle.UnpicklingError, zipfile.BadZipFile)
+
+# Parsed frames already read in this process, by CSV path and modification time
+_MEMORY = {}
+
+
+def _read_returns(filepath):
+    """Parse a price CSV into a date-sorted frame with daily % returns (before date filtering)."""
+    # Multi-threaded pyarrow parser when installed, default C engine otherwise
+    try:
+        df = pd.read_csv(filepath, engine='pyarrow')
+    except ImportError:
+        df = pd.read_csv(filepath)
+    # pyarrow may infer Date itself; pin the unit so both paths agree
+    dates = pd.to_datetime(df['Date']).to_numpy().astype('datetime64[us]')
+    order = np.argsort(dates, kind='stable')
+    
+    # Daily % returns on the date-sorted closes (same as pct_change * 100)
+    close = df['Close'].to_numpy(dtype=float)[order]
+    returns = np.empty_like(close)
+    returns[:1] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = (close[1:] / close[:-1] - 1.0) * 100.0
+    
+    # Drop the first/missing returns and extreme outliers (>100% daily moves)
+    keep = np.isfinite(returns) & (np.abs(returns) < 100)
+    rows = order[keep]
+    
+    columns = {col: df[col].to_numpy()[rows] for col in df.columns}
+    columns['Date'] = dates[rows]
+    columns['Return'] = returns[keep]
+    return pd.DataFrame(columns)
+
+
+def write_atomic(path, write):
     """
-    Load asset data and calculate returns.
-    Automatically applies standard date filters based on asset (unless overridden).
+    Write a cache file via a temporary file renamed into place, so an interrupted
+    run never leaves a partial file under the real name.
     
     Args:
-        filename: CSV filename in /mnt/user-data/uploads/
-        min_date: Optional minimum date string (e.g., '1920-01-01') to override default filtering.
-                  Set to None (default) for automatic filtering, or False for no filtering.
-        
-    Returns:
-        DataFrame with columns: Date, Open, High, Low, Close, Volume, Return
-        
+        path: Destination path; its directory is created if missing
+        write: Called with the open binary temporary file
+    
+    Failures are ignored (e.g. a read-only location): the cache is just rebuilt next time.
+    """
+    directory = os.path.dirname(path) or '.'
+    tmp_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(path)[1] + '.tmp')
+        with os.fdopen(fd, 'wb') as tmp_file:
+            write(tmp_file)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _cache_stamp(filepath):
+    """What a pickled frame was parsed from: the CSV, this parser, and the pandas that pickled it"""
+    return (os.path.getmtime(filepath), os.path.getmtime(__file__), pd.__version__)
+
+
+def _read_parsed(filepath, cache_path):
+    """Parsed frame from the pickle next to the CSV while its stamp matches, else parse the CSV and refresh the pickle"""
+    stamp = _cache_stamp(filepath)
+    if os.path.exists(cache_path):
+        try:
+            cached_stamp, df = pd.read_pickle(cache_path)
+            if cached_stamp == stamp:
+                return df
+        except UNREADABLE_CACHE_ERRORS:
+            pass  # Parse again and overwrite it
+    
+    df = _read_returns(filepath)
+    write_atomic(cache_path, lambda tmp_file: pd.to_pickle((stamp, df), tmp_file))
+    return df
+
+
+def find_asset_file(filename):
+    """
+    Resolve an asset CSV name to the first existing data location.
+    
     Raises:
         FileNotFoundError: If the CSV file doesn't exist
     """
@@ -39,14 +116,36 @@ def load_asset(filename, min_date=None):
         print(error_msg)
         raise FileNotFoundError(error_msg)
     
-    df = pd.read_csv(filepath)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.sort_values('Date').reset_index(drop=True)
-    df['Return'] = df['Close'].pct_change() * 100
-    df = df.dropna(subset=['Return'])
+    return filepath
+
+
+def load_asset(filename, min_date=None, dtype=None):
+    """
+    Load asset data and calculate returns.
+    Automatically applies standard date filters based on asset (unless overridden).
     
-    # Remove extreme outliers (>100% daily moves)
-    df = df[np.abs(df['Return']) < 100].reset_index(drop=True)
+    Args:
+        filename: CSV filename in /mnt/user-data/uploads/
+        min_date: Optional minimum date string (e.g., '1920-01-01') to override default filtering.
+                  Set to None (default) for automatic filtering, or False for no filtering.
+        dtype: Optional float dtype (e.g. np.float32) for Open/High/Low/Close/Return.
+               None (default) keeps float64; Volume is never downcast.
+        
+    Returns:
+        DataFrame with columns: Date, Open, High, Low, Close, Volume, Return
+        
+    Raises:
+        FileNotFoundError: If the CSV file doesn't exist
+    """
+    filepath = find_asset_file(filename)
+    
+    # Parsed frame is memoized per process, and cached next to the CSV until it or the parser changes
+    key = (filepath, os.path.getmtime(filepath))
+    cache_path = filepath + '.pkl'
+    if key in _MEMORY:
+        df = _MEMORY[key]
+    else:
+        df = _MEMORY[key] = _read_parsed(filepath, cache_path)
     
     # Apply date filter
     if min_date is False:
@@ -67,6 +166,16 @@ def load_asset(filename, min_date=None):
             df = df[df['Date'] >= '1975-01-01'].copy().reset_index(drop=True)
         # All other assets use full date range
     
+    # Opt-in downcast: float32 halves the bytes moved through the array kernels, but
+    # shifts |Return| threshold tests and long cumulative products slightly
+    if dtype is not None:
+        price_cols = [col for col in ('Open', 'High', 'Low', 'Close', 'Return') if col in df.columns]
+        df = df.astype({col: dtype for col in price_cols})
+    
+    # Callers add their own columns, so never hand out the memoized frame itself
+    if df is _MEMORY[key]:
+        df = df.copy()
+    
     print(f"✓ Loaded {filename}: {len(df):,} days from {df['Date'].min().date()} to {df['Date'].max().date()}")
     
     return df
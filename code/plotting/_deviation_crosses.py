@@ -0,0 +1,78 @@
+"""
+Shared cross detection for the deviation-cross plots.
+
+Every plot_crosses_* script marks the days Mean_Deviation falls back under its
+baseline; the sigma-filtered ones keep only the crosses that end a large enough
+excursion above it. Both scans run on plain arrays here.
+"""
+import numpy as np
+
+
+def crosses_under(md, bl):
+    """
+    Days the deviation crosses back under its baseline.
+
+    Zero-crossings of md - bl from above; comparisons with NaN are False, so
+    days without a value on either side never match.
+
+    Returns:
+        np.ndarray of day indices
+    """
+    gap = np.asarray(md) - np.asarray(bl)
+    return np.flatnonzero((gap[:-1] > 0) & (gap[1:] <= 0)) + 1
+
+
+def peak_filtered_crosses(md, bl, sigma, peak_sigmas=1.0, require_jump=False):
+    """
+    Cross-unders that end a significant excursion above the baseline.
+
+    Tracks each run above the baseline from the day it crosses up. At the
+    cross back under, it counts only if the run's peak height exceeded
+    peak_sigmas * sigma that day, and with require_jump, if the jump on the
+    day it crossed up also exceeded sigma.
+
+    Args:
+        md: Mean deviation per day
+        bl: Baseline per day
+        sigma: Rolling std of md - bl per day (NaN days never count)
+        peak_sigmas: Peak height threshold in units of sigma
+        require_jump: Also require the cross-up jump to exceed 1 sigma
+
+    Returns:
+        List of day indices
+    """
+    md = np.asarray(md)
+    bl = np.asarray(bl)
+    crosses = []
+    above_baseline = False
+    peak_height = 0
+    cross_up_magnitude = 0
+
+    # Only pairs of defined days can change state; skip the rest up front
+    valid = ~(np.isnan(md) | np.isnan(bl))
+    for i in (np.flatnonzero(valid[:-1] & valid[1:]) + 1).tolist():
+        curr_dev = md[i]
+        curr_base = bl[i]
+        prev_dev = md[i-1]
+        prev_base = bl[i-1]
+
+        # Crossing above baseline - start tracking peak, capture the jump
+        if prev_dev <= prev_base and curr_dev > curr_base:
+            above_baseline = True
+            cross_up_magnitude = curr_dev - prev_dev
+            peak_height = curr_dev - curr_base
+
+        # While above baseline, track max peak height
+        elif above_baseline and curr_dev > curr_base:
+            peak_height = max(peak_height, curr_dev - curr_base)
+
+        # Crossing back under baseline
+        elif above_baseline and prev_dev > prev_base and curr_dev <= curr_base:
+            above_baseline = False
+            if not np.isnan(sigma[i]) and peak_height > peak_sigmas * sigma[i]:
+                if not require_jump or abs(cross_up_magnitude) > sigma[i]:
+                    crosses.append(i)
+            peak_height = 0
+            cross_up_magnitude = 0
+
+    return crosses
@@ -0,0 +1,33 @@
+"""
+Shared panels for the deviation-cross plots.
+
+plot_crosses_84d, plot_crosses_double_sigma and plot_crosses_under differ only in
+how they pick the crosses and in a few marker sizes; the panels themselves are
+drawn here so styling and rendering changes land in one place.
+"""
+
+
+def price_panel(ax, dates, close, crosses, title, linewidth=1.5, alpha=0.6):
+    """SPX price on a log scale with a red vertical line at each cross"""
+    # One LineCollection spanning the axes height (what axvline does per line)
+    ax.vlines(dates[crosses], 0, 1, transform=ax.get_xaxis_transform(),
+              color='red', linewidth=linewidth, alpha=alpha)
+
+    ax.semilogy(dates, close, color='black', linewidth=1, alpha=0.8)
+    ax.set_ylabel('SPX Price (log scale)', fontsize=11, fontweight='bold')
+    ax.set_title(title, fontsize=13, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+
+
+def deviation_panel(ax, dates, md, bl, crosses, baseline_label, markersize=8):
+    """Mean deviation against its baseline with a red dot at each cross"""
+    ax.plot(dates, md, color='blue', linewidth=1.5, alpha=0.8, label='Mean Deviation')
+    ax.plot(dates, bl, color='orange', linewidth=2, alpha=0.8, label=baseline_label)
+    ax.axhline(y=0, color='gray', linestyle='--', linewidth=1, alpha=0.5)
+
+    ax.plot(dates[crosses], md[crosses], 'ro', markersize=markersize)
+
+    ax.set_ylabel('Mean CCDF Deviation', fontsize=11, fontweight='bold')
+    ax.set_xlabel('Date', fontsize=11, fontweight='bold')
+    ax.legend(loc='upper left', fontsize=10)
+    ax.grid(True, alpha=0.3)
@@ -1,28 +1,15 @@
 import sys
+import subprocess
 sys.path.append('code/data')
 sys.path.append('code/analysis')
 from load_data import load_asset
 from synthetic_vix import calculate_synthetic_vix
+from fit_quality import rolling_tail_fit
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import matplotlib
+matplotlib.use('Agg')  # Frames are drawn into the Agg RGBA buffer piped to ffmpeg
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-
-def calculate_alpha(returns, min_return=0.5):
-    """Calculate power law alpha from returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < 10:
-        return None, None, None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
-    return x, y, alpha, intercept
 
 # Load SPX
 print("Loading SPX data...")
@@ -33,77 +20,105 @@ df = calculate_synthetic_vix(df, window=21)
 window = 60
 print(f"Calculating {window}-day rolling CCDFs...")
 
-frames_data = []
-for i in range(window, len(df), 5):  # Every 5 days to keep it manageable
-    returns = df.iloc[i-window:i]['Return'].values
-    x, y, alpha, intercept = calculate_alpha(returns)
-    
-    if alpha is not None:
-        # Calculate power law fit at same x points
-        power_law_fit = np.exp(intercept) * (x ** (-alpha))
-        
-        # Calculate deviation
-        deviation = y - power_law_fit
-        
-        frames_data.append({
-            'date': df.iloc[i]['Date'],
-            'x': x,
-            'actual_ccdf': y,
-            'power_law': power_law_fit,
-            'deviation': deviation,
-            'alpha': alpha,
-            'vix': df.iloc[i]['SyntheticVIX'],
-            'price': df.iloc[i]['Close']
-        })
-
-print(f"Generated {len(frames_data)} frames")
+returns = df['Return'].values
+slope, intercept, _ = rolling_tail_fit(returns, window)
+
+# Frame days: every 5 days to keep it manageable, only those with a tail fit
+frame_idx = np.arange(window, len(df), 5)
+frame_idx = frame_idx[~np.isnan(slope[frame_idx])]
+
+# Sorted (descending) window of every frame in one call
+windows = sliding_window_view(np.abs(returns), window)[frame_idx - window]
+sorted_returns = np.sort(windows, axis=1)[:, ::-1]
+ccdf = np.arange(1, window+1) / window
+
+# One (n_frames, window) array per field; points outside the tail are NaN
+# (the tail is a prefix of each descending row) and are simply not drawn
+tail = sorted_returns > 0.5
+X = np.where(tail, sorted_returns, np.nan)
+Y = np.where(tail, ccdf, np.nan)
+alpha = -slope[frame_idx]
+
+# Calculate power law fit at same x points
+P = np.exp(intercept[frame_idx])[:, None] * X ** (-alpha[:, None])
+
+# Calculate deviation
+D = Y - P
+
+dates = df['Date'].iloc[frame_idx].dt.strftime('%Y-%m-%d').to_numpy()
+vix = df['SyntheticVIX'].to_numpy()[frame_idx]
+price = df['Close'].to_numpy()[frame_idx]
+x_max = X[:, 0]
+n_frames = len(frame_idx)
+
+print(f"Generated {n_frames} frames")
 
 # Create animation
 fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
 
-def animate(frame_idx):
-    ax1.clear()
-    ax2.clear()
-    
-    data = frames_data[frame_idx]
-    
+# Artists and static formatting are set up once; each frame only updates data
+line_dev, = ax1.plot([], [], 'b-', linewidth=2, alpha=0.8)
+ax1.axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.5)
+ax1.set_xlabel('Return Magnitude (%)', fontsize=11, fontweight='bold')
+ax1.set_ylabel('Deviation from Power Law', fontsize=11, fontweight='bold')
+title1 = ax1.set_title('\n', fontsize=12, fontweight='bold')
+ax1.grid(True, alpha=0.3)
+
+line_actual, = ax2.plot([], [], 'b-', linewidth=2, label='Actual CCDF', alpha=0.8)
+line_fit, = ax2.plot([], [], 'k--', linewidth=2, label='Power Law Fit', alpha=0.6)
+ax2.set_xlabel('Return Magnitude (%)', fontsize=11, fontweight='bold')
+ax2.set_ylabel('P(|Return| ≥ x)', fontsize=11, fontweight='bold')
+title2 = ax2.set_title('', fontsize=12, fontweight='bold')
+ax2.legend(loc='upper right')
+ax2.grid(True, alpha=0.3)
+ax2.set_yscale('log')
+
+def animate(i):
     # Left panel: Deviation curve
-    ax1.plot(data['x'], data['deviation'], 'b-', linewidth=2, alpha=0.8)
-    ax1.axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.5)
-    ax1.set_xlabel('Return Magnitude (%)', fontsize=11, fontweight='bold')
-    ax1.set_ylabel('Deviation from Power Law', fontsize=11, fontweight='bold')
-    ax1.set_title(f"CCDF Deviation from Power Law\nDate: {data['date'].strftime('%Y-%m-%d')} | α={data['alpha']:.3f} | VIX={data['vix']:.1f}%", 
-                  fontsize=12, fontweight='bold')
-    ax1.grid(True, alpha=0.3)
-    ax1.set_xlim(0.5, max(data['x']))
+    line_dev.set_data(X[i], D[i])
+    title1.set_text(f"CCDF Deviation from Power Law\nDate: {dates[i]} | α={alpha[i]:.3f} | VIX={vix[i]:.1f}%")
+    ax1.set_xlim(0.5, x_max[i])
+    ax1.relim()
+    ax1.autoscale_view(scalex=False)
     
     # Color code by volatility
-    if data['vix'] > 30:
+    if vix[i] > 30:
         ax1.set_facecolor('#ffcccc')  # Light red for high vol
-    elif data['vix'] < 15:
+    elif vix[i] < 15:
         ax1.set_facecolor('#ccffcc')  # Light green for low vol
     else:
         ax1.set_facecolor('white')
     
     # Right panel: Actual vs Power Law
-    ax2.plot(data['x'], data['actual_ccdf'], 'b-', linewidth=2, label='Actual CCDF', alpha=0.8)
-    ax2.plot(data['x'], data['power_law'], 'k--', linewidth=2, label='Power Law Fit', alpha=0.6)
-    ax2.set_xlabel('Return Magnitude (%)', fontsize=11, fontweight='bold')
-    ax2.set_ylabel('P(|Return| ≥ x)', fontsize=11, fontweight='bold')
-    ax2.set_title(f'SPX Price: ${data["price"]:.0f}', fontsize=12, fontweight='bold')
-    ax2.legend(loc='upper right')
-    ax2.grid(True, alpha=0.3)
-    ax2.set_xlim(0.5, max(data['x']))
-    ax2.set_yscale('log')
+    line_actual.set_data(X[i], Y[i])
+    line_fit.set_data(X[i], P[i])
+    title2.set_text(f'SPX Price: ${price[i]:.0f}')
+    ax2.set_xlim(0.5, x_max[i])
+    ax2.relim()
+    ax2.autoscale_view(scalex=False)
     
-    plt.tight_layout()
+    return line_dev, line_actual, line_fit, title1, title2
 
-# Create animation
-print("Creating animation...")
-anim = animation.FuncAnimation(fig, animate, frames=len(frames_data), interval=50, repeat=True)
+# Lay out once around a populated first frame
+animate(0)
+plt.tight_layout()
 
-# Save as mp4
+# Render frames straight into an ffmpeg pipe as raw RGBA (the layout of
+# the Agg buffer), encoding H.264 in a single pass
 print("Saving animation (this may take a minute)...")
-anim.save('ccdf_deviation_animation.mp4', writer='ffmpeg', fps=20, dpi=150)
+fig.set_dpi(150)
+width, height = fig.canvas.get_width_height()
+proc = subprocess.Popen(
+    ['ffmpeg', '-y', '-loglevel', 'error',
+     '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', '20', '-i', '-',
+     '-c:v', 'libx264', '-preset', 'faster', '-crf', '20', '-pix_fmt', 'yuv420p',
+     'ccdf_deviation_animation.mp4'],
+    stdin=subprocess.PIPE)
+for i in range(n_frames):
+    animate(i)
+    fig.canvas.draw()
+    proc.stdin.write(fig.canvas.buffer_rgba())
+proc.stdin.close()
+if proc.wait() != 0:
+    raise RuntimeError(f"ffmpeg exited with status {proc.returncode}")
 print("✓ Saved ccdf_deviation_animation.mp4")
-
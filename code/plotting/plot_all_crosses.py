@@ -0,0 +1,31 @@
+"""
+Render the three deviation-cross plots in one run.
+
+Cross detection runs here, in this process (the shared deviation frames come from
+rolling_deviation_cache); the three renders and PNG saves are independent and run in
+a process pool. Processes rather than threads: pyplot state and the mathtext parser
+are not safe to share across threads.
+"""
+import sys
+sys.path.append('code/data')
+sys.path.append('code/analysis')
+sys.path.append('code/plotting')
+import multiprocessing as mp
+
+import plot_crosses_84d
+import plot_crosses_double_sigma
+import plot_crosses_under
+
+SCRIPTS = [plot_crosses_84d, plot_crosses_double_sigma, plot_crosses_under]
+
+
+if __name__ == '__main__':
+    jobs = [script.find_crosses() for script in SCRIPTS]
+
+    with mp.Pool(min(len(SCRIPTS), mp.cpu_count())) as pool:
+        pending = [pool.apply_async(script.plot_crosses, (*job, script.OUTPUT_PATH, script.DPI))
+                   for script, job in zip(SCRIPTS, jobs)]
+        for result in pending:
+            result.get()
+
+    plot_crosses_double_sigma.print_cross_dates(*jobs[SCRIPTS.index(plot_crosses_double_sigma)])
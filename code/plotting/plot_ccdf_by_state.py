@@ -4,14 +4,18 @@ Plot CCDF (Complementary Cumulative Distribution Function) by state.
 Creates log-log plot showing power law behavior with different states colored.
 Extracted from colored_graph_fixed.py
 """
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 
+from power_law import fit_line
+
 
 def plot_ccdf_by_state(ccdf_data, title='CCDF by State', output_path=None,
                         asset_name='Asset', date_range=None, show_fit=True,
                         fit_range=(0.5, 30), xlim=(0.3, 5), ylim=(0.01, 1),
-                        highlight_zone=(0.5, 3.0)):
+                        highlight_zone=(0.5, 3.0), dpi=150):
     """
     Plot CCDF in log-log space, colored by state.
     Uses the exact plotting style from colored_graph_fixed.py
@@ -21,6 +25,7 @@ def plot_ccdf_by_state(ccdf_data, title='CCDF by State', output_path=None,
                    Keys: 'all', 'green', 'red', 'orange' (optional)
         title: Plot title (or None to auto-generate)
         output_path: If provided, save to this path
+        dpi: Resolution of the saved PNG (300 for print quality)
         asset_name: Name of asset for title
         date_range: Tuple of (start_date, end_date) for title
         show_fit: If True, fit and plot power law line
@@ -36,12 +41,14 @@ def plot_ccdf_by_state(ccdf_data, title='CCDF by State', output_path=None,
     fig, ax = plt.subplots(figsize=(20, 12))
     plt.subplots_adjust(left=0.08, right=0.95, top=0.92, bottom=0.08)
     
-    # Plot 'all' data FIRST as background (black, lower alpha)
+    # Plot 'all' data FIRST as background (black, lower alpha). Markers are
+    # drawn as marker-only Line2Ds (one path stamped per point), which render
+    # much faster than scatter's PathCollection; markersize is sqrt(scatter s)
     if 'all' in ccdf_data:
         x_all, y_all = ccdf_data['all']
         valid = (x_all > 0) & (y_all > 0)
-        ax.scatter(x_all[valid], y_all[valid], color='black', alpha=0.3, s=20,
-                  label='All Returns (full CCDF)', edgecolors='none', zorder=2)
+        ax.plot(x_all[valid], y_all[valid], 'o', color='black', alpha=0.3, markersize=np.sqrt(20),
+                markeredgewidth=0, linestyle='none', label='All Returns (full CCDF)', zorder=2)
         
         # Fit power law to all data
         if show_fit:
@@ -51,9 +58,7 @@ def plot_ccdf_by_state(ccdf_data, title='CCDF by State', output_path=None,
             y_fit = y_all[fit_mask]
             
             if len(x_fit) > 1:
-                log_x = np.log(x_fit)
-                log_y = np.log(y_fit)
-                slope, intercept = np.polyfit(log_x, log_y, 1)
+                slope, intercept = fit_line(np.log(x_fit), np.log(y_fit))
                 alpha = -slope
                 
                 # Plot fitted line across wider range than fit
@@ -69,25 +74,25 @@ def plot_ccdf_by_state(ccdf_data, title='CCDF by State', output_path=None,
     if 'green' in ccdf_data:
         x, y = ccdf_data['green']
         pct = len(x) / total_days * 100 if total_days > 0 else 0
-        ax.scatter(x, y, color='green', alpha=0.6, s=50,
-                  label=f'GREEN state ({len(x)} days, {pct:.1f}%)',
-                  edgecolors='darkgreen', linewidth=0.5, zorder=3)
+        ax.plot(x, y, 'o', color='green', alpha=0.6, markersize=np.sqrt(50),
+                markeredgecolor='darkgreen', markeredgewidth=0.5, linestyle='none',
+                label=f'GREEN state ({len(x)} days, {pct:.1f}%)', zorder=3)
     
     # Plot ORANGE state (if exists)
     if 'orange' in ccdf_data:
         x, y = ccdf_data['orange']
         pct = len(x) / total_days * 100 if total_days > 0 else 0
-        ax.scatter(x, y, color='orange', alpha=0.8, s=80,
-                  label=f'ORANGE state ({len(x)} days, {pct:.1f}%)',
-                  edgecolors='darkorange', linewidth=0.5, zorder=4)
+        ax.plot(x, y, 'o', color='orange', alpha=0.8, markersize=np.sqrt(80),
+                markeredgecolor='darkorange', markeredgewidth=0.5, linestyle='none',
+                label=f'ORANGE state ({len(x)} days, {pct:.1f}%)', zorder=4)
     
     # Plot RED state
     if 'red' in ccdf_data:
         x, y = ccdf_data['red']
         pct = len(x) / total_days * 100 if total_days > 0 else 0
-        ax.scatter(x, y, color='red', alpha=0.6, s=50,
-                  label=f'RED state ({len(x)} days, {pct:.1f}%)',
-                  edgecolors='darkred', linewidth=0.5, zorder=3)
+        ax.plot(x, y, 'o', color='red', alpha=0.6, markersize=np.sqrt(50),
+                markeredgecolor='darkred', markeredgewidth=0.5, linestyle='none',
+                label=f'RED state ({len(x)} days, {pct:.1f}%)', zorder=3)
     
     # Highlight moderate zone
     if highlight_zone:
@@ -122,7 +127,7 @@ def plot_ccdf_by_state(ccdf_data, title='CCDF by State', output_path=None,
     ax.grid(True, alpha=0.3, which='both')
     
     if output_path:
-        plt.savefig(output_path, dpi=300)
+        plt.savefig(output_path, dpi=dpi)
         print(f"✓ CCDF plot saved to {output_path}")
     
     return fig, ax
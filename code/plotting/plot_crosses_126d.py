@@ -1,75 +1,27 @@
 import sys
 sys.path.append('code/data')
 sys.path.append('code/analysis')
-from load_data import load_asset
-from synthetic_vix import calculate_synthetic_vix
-import numpy as np
-import pandas as pd
+from rolling_deviation_cache import get_mean_deviation
+from synthetic_vix import rolling_mean
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from _deviation_crosses import crosses_under as find_crosses_under
 
-def calculate_alpha(returns, min_return=0.5, min_points=5):
-    """Calculate power law alpha from returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < min_points:
-        return None, None, None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
-    return x, y, alpha, intercept
-
-# Load SPX
-print("Loading SPX data...")
-df = load_asset('_spx_d.csv', min_date='1990-01-01')
-df = calculate_synthetic_vix(df, window=21)
-
-# Calculate rolling mean deviation
+# Load SPX with its rolling mean deviation
 window = 60
-print(f"Calculating {window}-day rolling mean CCDF deviation...")
-
-mean_deviations = []
-for i in range(len(df)):
-    if i < window:
-        mean_deviations.append(np.nan)
-    else:
-        returns = df.iloc[i-window:i]['Return'].values
-        x, y, alpha, intercept = calculate_alpha(returns)
-        
-        if alpha is not None:
-            power_law_fit = np.exp(intercept) * (x ** (-alpha))
-            deviation = y - power_law_fit
-            mask = (x >= 0.5) & (x <= 3.0)
-            if mask.sum() > 0:
-                mean_dev = np.mean(deviation[mask])
-                mean_deviations.append(mean_dev)
-            else:
-                mean_deviations.append(np.nan)
-        else:
-            mean_deviations.append(np.nan)
-
-df['Mean_Deviation'] = mean_deviations
+print(f"Loading SPX data and {window}-day rolling mean CCDF deviation...")
+df = get_mean_deviation('_spx_d.csv', window, min_date='1990-01-01', min_points=5)
 
 # Calculate baseline - 126 days = 6 months
 baseline_window = 126
-df['Baseline'] = df['Mean_Deviation'].rolling(window=baseline_window).mean()
+df['Baseline'] = rolling_mean(df['Mean_Deviation'].to_numpy(), baseline_window)
 
 print(f"Mean_Deviation NaN count: {df['Mean_Deviation'].isna().sum()}")
 print(f"Baseline NaN count: {df['Baseline'].isna().sum()}")
 
 # Find crosses back under baseline
-crosses_under = []
-for i in range(1, len(df)):
-    if pd.notna(df.iloc[i-1]['Mean_Deviation']) and pd.notna(df.iloc[i]['Mean_Deviation']) and \
-       pd.notna(df.iloc[i-1]['Baseline']) and pd.notna(df.iloc[i]['Baseline']):
-        if df.iloc[i-1]['Mean_Deviation'] > df.iloc[i-1]['Baseline'] and \
-           df.iloc[i]['Mean_Deviation'] <= df.iloc[i]['Baseline']:
-            crosses_under.append(i)
+crosses_under = find_crosses_under(df['Mean_Deviation'].to_numpy(), df['Baseline'].to_numpy())
 
 print(f"✓ Found {len(crosses_under)} crosses back under baseline")
 
@@ -1,100 +1,31 @@
 import sys
 sys.path.append('code/data')
 sys.path.append('code/analysis')
-from load_data import load_asset
-from synthetic_vix import calculate_synthetic_vix
-import numpy as np
-import pandas as pd
+from rolling_deviation_cache import get_mean_deviation
+from synthetic_vix import rolling_mean, rolling_std
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from _deviation_crosses import peak_filtered_crosses
 
-def calculate_alpha(returns, min_return=0.5, min_points=5):
-    """Calculate power law alpha from returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < min_points:
-        return None, None, None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
-    return x, y, alpha, intercept
-
-# Load SPX
-print("Loading SPX data...")
-df = load_asset('_spx_d.csv')
-df = calculate_synthetic_vix(df, window=21)
-
-# Calculate rolling mean deviation
+# Load SPX with its rolling mean deviation - full dataset from 1920
 window = 60
-print(f"Calculating {window}-day rolling mean CCDF deviation...")
-
-mean_deviations = []
-for i in range(len(df)):
-    if i < window:
-        mean_deviations.append(np.nan)
-    else:
-        returns = df.iloc[i-window:i]['Return'].values
-        x, y, alpha, intercept = calculate_alpha(returns)
-        
-        if alpha is not None:
-            power_law_fit = np.exp(intercept) * (x ** (-alpha))
-            deviation = y - power_law_fit
-            mask = (x >= 0.5) & (x <= 3.0)
-            if mask.sum() > 0:
-                mean_dev = np.mean(deviation[mask])
-                mean_deviations.append(mean_dev)
-            else:
-                mean_deviations.append(np.nan)
-        else:
-            mean_deviations.append(np.nan)
-
-df['Mean_Deviation'] = mean_deviations
+print(f"Loading SPX data and {window}-day rolling mean CCDF deviation...")
+df = get_mean_deviation('_spx_d.csv', window, min_date=None, min_points=5)
 
 # Calculate baseline
 baseline_window = 84
-df['Baseline'] = df['Mean_Deviation'].rolling(window=baseline_window).mean()
+df['Baseline'] = rolling_mean(df['Mean_Deviation'].to_numpy(), baseline_window)
 
 # Calculate standard deviation of (deviation - baseline)
 df['Deviation_From_Baseline'] = df['Mean_Deviation'] - df['Baseline']
-rolling_std = df['Deviation_From_Baseline'].rolling(window=252).std()
+sigma = rolling_std(df['Deviation_From_Baseline'].to_numpy(), 252)
 
 print(f"Mean_Deviation NaN count: {df['Mean_Deviation'].isna().sum()}")
 
 # Find crosses with peak tracking
-crosses_under_filtered = []
-above_baseline = False
-peak_height = 0
-
-for i in range(1, len(df)):
-    if pd.notna(df.iloc[i-1]['Mean_Deviation']) and pd.notna(df.iloc[i]['Mean_Deviation']) and \
-       pd.notna(df.iloc[i-1]['Baseline']) and pd.notna(df.iloc[i]['Baseline']):
-        
-        curr_dev = df.iloc[i]['Mean_Deviation']
-        curr_base = df.iloc[i]['Baseline']
-        prev_dev = df.iloc[i-1]['Mean_Deviation']
-        prev_base = df.iloc[i-1]['Baseline']
-        
-        # Crossing above baseline - start tracking peak
-        if prev_dev <= prev_base and curr_dev > curr_base:
-            above_baseline = True
-            peak_height = curr_dev - curr_base
-        
-        # While above baseline, track max peak height
-        elif above_baseline and curr_dev > curr_base:
-            peak_height = max(peak_height, curr_dev - curr_base)
-        
-        # Crossing back under baseline
-        elif above_baseline and prev_dev > prev_base and curr_dev <= curr_base:
-            above_baseline = False
-            # Only count if peak was > 1 std dev
-            if pd.notna(rolling_std.iloc[i]) and peak_height > rolling_std.iloc[i]:
-                crosses_under_filtered.append(i)
-            peak_height = 0
+crosses_under_filtered = peak_filtered_crosses(df['Mean_Deviation'].to_numpy(), df['Baseline'].to_numpy(),
+                                               sigma)
 
 print(f"✓ Found {len(crosses_under_filtered)} significant crosses (peak >1σ)")
 
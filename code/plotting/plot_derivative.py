@@ -4,13 +4,15 @@ Plot CCDF derivative by state.
 Visualizes the output from calculate_derivative.py (which uses np.diff).
 Plots as lines to show where the distribution "bends" from pure power law.
 """
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 
 
 def plot_derivative(deriv_data, ccdf_data, output_path=None, 
                    asset_name='Asset', date_range=None,
-                   xlim=(0.3, 5), ylim=(None, 0)):
+                   xlim=(0.3, 5), ylim=(None, 0), dpi=150):
     """
     Plot derivatives on two separate panels for clarity.
     Top: State derivatives (GREEN/ORANGE/RED)
@@ -20,6 +22,7 @@ def plot_derivative(deriv_data, ccdf_data, output_path=None,
         deriv_data: dict from calculate_derivative() with (x_mid, derivative) tuples
         ccdf_data: dict from calculate_ccdf() (not used, kept for API compatibility)
         output_path: If provided, save to this path
+        dpi: Resolution of the saved PNG (300 for print quality)
         asset_name: Name of asset for title
         date_range: Tuple of (start_date, end_date) for title
         xlim: X-axis limits for both panels
@@ -92,7 +95,7 @@ def plot_derivative(deriv_data, ccdf_data, output_path=None,
     ax2.grid(True, alpha=0.3)
     
     if output_path:
-        plt.savefig(output_path, dpi=300)
+        plt.savefig(output_path, dpi=dpi)
         print(f"✓ Derivative plot saved to {output_path}")
     
     return fig, (ax1, ax2)
@@ -1,54 +1,21 @@
 import sys
 sys.path.append('code/data')
 sys.path.append('code/analysis')
-from load_data import load_asset
-from synthetic_vix import calculate_synthetic_vix
+from rolling_deviation_cache import get_mean_deviation
+from synthetic_vix import rolling_mean
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
-def calculate_alpha(returns, min_return=0.5):
-    """Calculate power law alpha from returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < 10:
-        return None, None, None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
-    return x, y, alpha, intercept
-
-# Load SPX
-print("Loading SPX data...")
-df = load_asset('_spx_d.csv', min_date='1990-01-01')
-df = calculate_synthetic_vix(df, window=21)
-
-# Calculate rolling mean deviation
+# Load SPX with its rolling mean deviation (stricter fit: tail >= 10 points)
 window = 60
-print(f"Calculating {window}-day rolling mean CCDF deviation...")
-
-df['Mean_Deviation'] = np.nan
-
-for i in range(window, len(df)):
-    returns = df.iloc[i-window:i]['Return'].values
-    x, y, alpha, intercept = calculate_alpha(returns)
-    
-    if alpha is not None:
-        power_law_fit = np.exp(intercept) * (x ** (-alpha))
-        deviation = y - power_law_fit
-        mask = (x >= 0.5) & (x <= 3.0)
-        if mask.sum() > 0:
-            mean_dev = np.mean(deviation[mask])
-            df.iloc[i, df.columns.get_loc('Mean_Deviation')] = mean_dev
+print(f"Loading SPX data and {window}-day rolling mean CCDF deviation...")
+df = get_mean_deviation('_spx_d.csv', window, min_date='1990-01-01', min_points=10)
 
 # Calculate slow moving average (1 year = 252 days)
 baseline_window = 252
-df['Baseline'] = df['Mean_Deviation'].rolling(window=baseline_window).mean()
+df['Baseline'] = rolling_mean(df['Mean_Deviation'].to_numpy(), baseline_window)
 
 # Mark peaks (current > baseline)
 df['Above_Baseline'] = df['Mean_Deviation'] > df['Baseline']
@@ -59,25 +26,16 @@ print("✓ Calculated baseline and peaks")
 fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(18, 10), sharex=True)
 
 # Top: SPX price with peak periods shaded
-peak_regions = []
-in_peak = False
-start_idx = None
-
-for i in range(len(df)):
-    if df.iloc[i]['Above_Baseline'] and not in_peak:
-        in_peak = True
-        start_idx = i
-    elif not df.iloc[i]['Above_Baseline'] and in_peak:
-        in_peak = False
-        if start_idx is not None:
-            peak_regions.append((start_idx, i-1))
-        start_idx = None
-
-if in_peak and start_idx is not None:
-    peak_regions.append((start_idx, len(df)-1))
-
+# Regions run from each False->True edge of Above_Baseline to the day before
+# the next True->False edge (or to the last day if still above)
+edges = np.diff(df['Above_Baseline'].to_numpy().astype(np.int8), prepend=0, append=0)
+starts = np.flatnonzero(edges == 1)
+ends = np.flatnonzero(edges == -1) - 1
+peak_regions = list(zip(starts.tolist(), ends.tolist()))
+
+dates = df['Date'].to_numpy()
 for start, end in peak_regions:
-    ax1.axvspan(df.iloc[start]['Date'], df.iloc[end]['Date'], color='red', alpha=0.15)
+    ax1.axvspan(dates[start], dates[end], color='red', alpha=0.15)
 
 ax1.semilogy(df['Date'], df['Close'], color='black', linewidth=1, alpha=0.8)
 ax1.set_ylabel('SPX Price (log scale)', fontsize=11, fontweight='bold')
@@ -86,7 +44,7 @@ ax1.grid(True, alpha=0.3)
 
 # Bottom: Mean deviation vs baseline
 for start, end in peak_regions:
-    ax2.axvspan(df.iloc[start]['Date'], df.iloc[end]['Date'], color='red', alpha=0.15)
+    ax2.axvspan(dates[start], dates[end], color='red', alpha=0.15)
 
 ax2.plot(df['Date'], df['Mean_Deviation'], color='blue', linewidth=1.5, alpha=0.8, label='Mean Deviation')
 ax2.plot(df['Date'], df['Baseline'], color='orange', linewidth=2, alpha=0.8, label=f'{baseline_window}d Baseline')
@@ -1,52 +1,12 @@
 import sys
 sys.path.append('code/data')
 sys.path.append('code/analysis')
-from load_data import load_asset
-from synthetic_vix import calculate_synthetic_vix
-import numpy as np
+from rolling_deviation_cache import get_mean_deviation
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
-def calculate_alpha(returns, min_return=0.5, min_points=5):
-    """Calculate power law alpha from returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < min_points:
-        return None, None, None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
-    return x, y, alpha, intercept
-
-def calculate_mean_deviation(df, window=60):
-    """Calculate mean CCDF deviation"""
-    mean_deviations = []
-    for i in range(len(df)):
-        if i < window:
-            mean_deviations.append(np.nan)
-        else:
-            returns = df.iloc[i-window:i]['Return'].values
-            x, y, alpha, intercept = calculate_alpha(returns)
-            
-            if alpha is not None:
-                power_law_fit = np.exp(intercept) * (x ** (-alpha))
-                deviation = y - power_law_fit
-                mask = (x >= 0.5) & (x <= 3.0)
-                if mask.sum() > 0:
-                    mean_dev = np.mean(deviation[mask])
-                    mean_deviations.append(mean_dev)
-                else:
-                    mean_deviations.append(np.nan)
-            else:
-                mean_deviations.append(np.nan)
-    return mean_deviations
-
 # Assets to test (one from each category)
 assets = [
     ('_ndx_d.csv', 'NASDAQ (NDX)'),
@@ -60,8 +20,8 @@ fig, axes = plt.subplots(len(assets), 2, figsize=(20, 4*len(assets)))
 
 for idx, (filename, name) in enumerate(assets):
     print(f"\nProcessing {name}...")
-    df = load_asset(filename)
-    df['Mean_Deviation'] = calculate_mean_deviation(df)
+    # Rolling mean CCDF deviation over load_asset's default date range for the asset
+    df = get_mean_deviation(filename, min_date=None, min_points=5)
     
     pct_above = (df['Mean_Deviation'] > 0).sum() / df['Mean_Deviation'].notna().sum() * 100
     print(f"  % Above zero: {pct_above:.1f}%")
@@ -1,51 +1,16 @@
 import sys
 sys.path.append('code/data')
 sys.path.append('code/analysis')
-from load_data import load_asset
-from synthetic_vix import calculate_synthetic_vix
-import numpy as np
+from rolling_deviation_cache import get_mean_deviation
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from scipy.signal import find_peaks
 
-def calculate_alpha(returns, min_return=0.5):
-    """Calculate power law alpha from returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < 10:
-        return None, None, None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
-    return x, y, alpha, intercept
-
-# Load SPX
-print("Loading SPX data...")
-df = load_asset('_spx_d.csv', min_date='1990-01-01')
-df = calculate_synthetic_vix(df, window=21)
-
-# Calculate rolling mean deviation
+# Load SPX with its rolling mean deviation (stricter fit: tail >= 10 points)
 window = 60
-print(f"Calculating {window}-day rolling mean CCDF deviation...")
-
-df['Mean_Deviation'] = np.nan
-
-for i in range(window, len(df)):
-    returns = df.iloc[i-window:i]['Return'].values
-    x, y, alpha, intercept = calculate_alpha(returns)
-    
-    if alpha is not None:
-        power_law_fit = np.exp(intercept) * (x ** (-alpha))
-        deviation = y - power_law_fit
-        mask = (x >= 0.5) & (x <= 3.0)
-        if mask.sum() > 0:
-            mean_dev = np.mean(deviation[mask])
-            df.iloc[i, df.columns.get_loc('Mean_Deviation')] = mean_dev
+print(f"Loading SPX data and {window}-day rolling mean CCDF deviation...")
+df = get_mean_deviation('_spx_d.csv', window, min_date='1990-01-01', min_points=10)
 
 # Find sharp peaks using scipy
 # prominence = how much peak stands out from surroundings
@@ -1,35 +1,70 @@
-import pickle
+import multiprocessing as mp
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import sys
 
-# Load frame data
-with open('animation_frames/frame_data.pkl', 'rb') as f:
-    frames_data = pickle.load(f)
+FRAME_FILE = 'animation_frames/frame_data.npz'
 
-# Get chunk info from command line
-start_idx = int(sys.argv[1])
-end_idx = int(sys.argv[2])
+# Per-process state: the frame arrays and one persistent figure, set up by init_worker
+frames = None
+fig = None
+artists = None
 
-print(f"Rendering frames {start_idx} to {end_idx}...")
 
-for frame_idx in range(start_idx, end_idx):
-    if frame_idx >= len(frames_data):
-        break
-        
-    data = frames_data[frame_idx]
-    
+def load_frames():
+    """Column arrays written by generate_frame_data.py"""
+    with np.load(FRAME_FILE) as frame_file:
+        return {key: frame_file[key] for key in frame_file.files}
+
+
+def build_figure():
+    """Figure with its artists and static formatting; frames only update data"""
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
-    
-    # Left panel: Deviation curve
-    ax1.plot(data['x'], data['deviation'], 'b-', linewidth=2, alpha=0.8)
+
+    line_dev, = ax1.plot([], [], 'b-', linewidth=2, alpha=0.8)
     ax1.axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.5)
     ax1.set_xlabel('Return Magnitude (%)', fontsize=11, fontweight='bold')
     ax1.set_ylabel('Deviation from Power Law', fontsize=11, fontweight='bold')
-    ax1.set_title(f"CCDF Deviation from Power Law\nDate: {data['date'].strftime('%Y-%m-%d')} | α={data['alpha']:.3f} | VIX={data['vix']:.1f}%", 
-                  fontsize=12, fontweight='bold')
+    title1 = ax1.set_title('\n', fontsize=12, fontweight='bold')
     ax1.grid(True, alpha=0.3)
+
+    line_actual, = ax2.plot([], [], 'b-', linewidth=2, label='Actual CCDF', alpha=0.8)
+    line_fit, = ax2.plot([], [], 'k--', linewidth=2, label='Power Law Fit', alpha=0.6)
+    ax2.set_xlabel('Return Magnitude (%)', fontsize=11, fontweight='bold')
+    ax2.set_ylabel('P(|Return| ≥ x)', fontsize=11, fontweight='bold')
+    title2 = ax2.set_title('', fontsize=12, fontweight='bold')
+    ax2.legend(loc='upper right')
+    ax2.grid(True, alpha=0.3)
+    ax2.set_yscale('log')
+
+    return fig, (ax1, ax2, line_dev, title1, line_actual, line_fit, title2)
+
+
+def draw_frame(frame_idx):
+    """Point the persistent artists at one frame's data"""
+    ax1, ax2, line_dev, title1, line_actual, line_fit, title2 = artists
+
+    n = frames['n_points'][frame_idx]
+    data = {
+        'date': str(frames['date'][frame_idx]),
+        'x': frames['x'][frame_idx, :n],
+        'actual_ccdf': frames['actual_ccdf'][frame_idx, :n],
+        'power_law': frames['power_law'][frame_idx, :n],
+        'deviation': frames['deviation'][frame_idx, :n],
+        'alpha': frames['alpha'][frame_idx],
+        'vix': frames['vix'][frame_idx],
+        'price': frames['price'][frame_idx]
+    }
+
+    # Left panel: Deviation curve
+    line_dev.set_data(data['x'], data['deviation'])
+    title1.set_text(f"CCDF Deviation from Power Law\nDate: {data['date']} | α={data['alpha']:.3f} | VIX={data['vix']:.1f}%")
     ax1.set_xlim(0.5, max(data['x']))
-    
+    ax1.relim()
+    ax1.autoscale_view(scalex=False)
+
     # Color code by volatility
     if data['vix'] > 30:
         ax1.set_facecolor('#ffcccc')
@@ -37,20 +72,47 @@ for frame_idx in range(start_idx, end_idx):
         ax1.set_facecolor('#ccffcc')
     else:
         ax1.set_facecolor('white')
-    
+
     # Right panel: Actual vs Power Law
-    ax2.plot(data['x'], data['actual_ccdf'], 'b-', linewidth=2, label='Actual CCDF', alpha=0.8)
-    ax2.plot(data['x'], data['power_law'], 'k--', linewidth=2, label='Power Law Fit', alpha=0.6)
-    ax2.set_xlabel('Return Magnitude (%)', fontsize=11, fontweight='bold')
-    ax2.set_ylabel('P(|Return| ≥ x)', fontsize=11, fontweight='bold')
-    ax2.set_title(f'SPX Price: ${data["price"]:.0f}', fontsize=12, fontweight='bold')
-    ax2.legend(loc='upper right')
-    ax2.grid(True, alpha=0.3)
+    line_actual.set_data(data['x'], data['actual_ccdf'])
+    line_fit.set_data(data['x'], data['power_law'])
+    title2.set_text(f'SPX Price: ${data["price"]:.0f}')
     ax2.set_xlim(0.5, max(data['x']))
-    ax2.set_yscale('log')
-    
-    plt.tight_layout()
-    plt.savefig(f'animation_frames/frame_{frame_idx:04d}.png', dpi=100)
-    plt.close()
+    ax2.relim()
+    ax2.autoscale_view(scalex=False)
+
+
+def init_worker(layout_idx):
+    """Load the frames and build this process's figure, laid out around layout_idx"""
+    global frames, fig, artists
+    frames = load_frames()
+    fig, artists = build_figure()
+    # Every worker lays out around the same frame, so all frames share one layout
+    draw_frame(layout_idx)
+    fig.tight_layout()
+
+
+def render_one(frame_idx):
+    draw_frame(frame_idx)
+    fig.savefig(f'animation_frames/frame_{frame_idx:04d}.png', dpi=100)
+
+
+if __name__ == '__main__':
+    # Get chunk info from command line
+    start_idx = int(sys.argv[1])
+    end_idx = int(sys.argv[2])
+
+    with np.load(FRAME_FILE) as frame_file:
+        n_frames = len(frame_file['alpha'])
+    frame_ids = range(start_idx, min(end_idx, n_frames))
+
+    print(f"Rendering frames {start_idx} to {end_idx}...")
+
+    # Frames are independent; each worker renders its share into its own figure
+    if len(frame_ids) > 0:
+        with mp.Pool(min(mp.cpu_count(), len(frame_ids)), initializer=init_worker,
+                     initargs=(start_idx,)) as pool:
+            for _ in pool.imap_unordered(render_one, frame_ids, chunksize=4):
+                pass
 
-print(f"✓ Rendered {end_idx - start_idx} frames")
+    print(f"✓ Rendered {end_idx - start_idx} frames")
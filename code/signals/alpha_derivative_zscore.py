@@ -14,23 +14,45 @@ Signal States:
 """
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
+# State column categories; codes index into this list
+STATES = ['GREEN', 'ORANGE', 'RED']
 
-def calculate_alpha(returns, min_return=0.5):
-    """Calculate power law alpha from returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < 10:
-        return None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
+
+def rolling_alpha(returns, window, min_return=0.5, min_points=10):
+    """
+    Power law alpha of every trailing window, without a per-day loop.
+    
+    For each i, fits the |r| > min_return tail of returns[i-window:i] by
+    least squares on log |r| against log of its CCDF ranks 1..k out of
+    window. The windows are stacked into a 2D view, sorted row-wise, and the
+    regression is solved in closed form from masked row sums.
+    
+    Returns:
+        np.ndarray of len(returns), NaN where there is no full window or
+        fewer than min_points tail values
+    """
+    alpha = np.full(len(returns), np.nan)
+    if len(returns) <= window:
+        return alpha
+    
+    # Row j holds the window before day j + window, in descending order,
+    # so the tail is a prefix with CCDF ranks 1..k out of window
+    sorted_returns = np.sort(np.abs(sliding_window_view(returns, window)[:-1]), axis=1)[:, ::-1]
+    tail = sorted_returns > min_return
+    k = tail.sum(axis=1)
+    log_x = np.log(np.where(tail, sorted_returns, 1.0))  # 0 outside the tail
+    log_y = np.where(tail, np.log(np.arange(1, window + 1) / window), 0.0)
+    
+    sx = log_x.sum(axis=1)
+    sy = log_y.sum(axis=1)
+    sxx = np.einsum('ij,ij->i', log_x, log_x)
+    sxy = np.einsum('ij,ij->i', log_x, log_y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (k * sxy - sx * sy) / (k * sxx - sx * sx)
+    
+    alpha[window:] = np.where(k >= min_points, -slope, np.nan)
     return alpha
 
 
@@ -45,7 +67,7 @@ def calculate_signal(df, alpha_window=42, ma_window=84, zscore_window=504):
         zscore_window: Window for z-score normalization (default 504)
         
     Returns:
-        DataFrame with State column added:
+        DataFrame with categorical State column added:
         - 'GREEN': Z-score > 1 (more chaotic)
         - 'ORANGE': -1 <= Z-score <= 1 (neutral)
         - 'RED': Z-score < -1 (quieter/stable)
@@ -53,11 +75,7 @@ def calculate_signal(df, alpha_window=42, ma_window=84, zscore_window=504):
     df = df.copy()
     
     # Calculate rolling alpha on full dataframe
-    df['Alpha'] = np.nan
-    for i in range(alpha_window, len(df)):
-        alpha = calculate_alpha(df.iloc[i-alpha_window:i]['Return'].values)
-        if alpha is not None:
-            df.iloc[i, df.columns.get_loc('Alpha')] = alpha
+    df['Alpha'] = rolling_alpha(df['Return'].to_numpy(dtype=float), alpha_window)
     
     # Work on clean subset for derivative and zscore calculations
     df_clean = df[df['Alpha'].notna()].copy().reset_index(drop=True)
@@ -72,20 +90,17 @@ def calculate_signal(df, alpha_window=42, ma_window=84, zscore_window=504):
     df_clean['MA_Std'] = df_clean['Abs_Derivative_MA'].rolling(window=zscore_window).std()
     df_clean['ZScore'] = (df_clean['Abs_Derivative_MA'] - df_clean['MA_Mean']) / df_clean['MA_Std']
     
-    # Assign states on clean data
-    df_clean['State'] = 'ORANGE'
-    df_clean.loc[df_clean['ZScore'] > 1, 'State'] = 'GREEN'
-    df_clean.loc[df_clean['ZScore'] < -1, 'State'] = 'RED'
-    
-    # Map states back to original dataframe using Date
-    df['State'] = 'ORANGE'  # Default for rows without Alpha
-    date_to_state = dict(zip(df_clean['Date'], df_clean['State']))
-    df['State'] = df['Date'].map(date_to_state).fillna('ORANGE')
+    # Assign state codes on clean data, then place them back on the rows
+    # df_clean came from (rows without Alpha stay ORANGE)
+    zscore = df_clean['ZScore'].to_numpy()
+    state = np.full(len(df), STATES.index('ORANGE'), dtype=np.int8)
+    state[df['Alpha'].notna().to_numpy()] = np.select(
+        [zscore > 1, zscore < -1], [STATES.index('GREEN'), STATES.index('RED')],
+        default=STATES.index('ORANGE'))
+    df['State'] = pd.Categorical.from_codes(state, categories=STATES)
     
     # Print summary
-    red_days = (df['State'] == 'RED').sum()
-    orange_days = (df['State'] == 'ORANGE').sum()
-    green_days = (df['State'] == 'GREEN').sum()
+    green_days, orange_days, red_days = np.bincount(state, minlength=len(STATES))
     
     print(f"✓ Alpha derivative z-score signal calculated:")
     print(f"  RED: {red_days:,} days ({red_days/len(df)*100:.1f}%)")
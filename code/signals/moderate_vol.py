@@ -14,88 +14,36 @@ Signal Logic:
 import pandas as pd
 import numpy as np
 
+# State column categories; codes index into this list
+STATES = ['GREEN', 'ORANGE', 'RED']
 
-def calculate_signal(df):
+
+def _run_state_machines(close, signal_raw):
     """
-    Calculate moderate volatility signal states.
+    Rally filter and recovery-mode state machines over one price series.
+    
+    Both machines advance on the same day: the recovery machine reads the
+    rally filter's output for that day, so one loop runs them together.
+    The loop runs over Python lists; indexing a DataFrame row per day
+    costs far more than the comparisons themselves.
     
     Args:
-        df: DataFrame with columns: Date, Close, Return
+        close: Array of closing prices
+        signal_raw: Array of 0/1 raw signals (above threshold)
         
     Returns:
-        DataFrame with added columns:
-            - ModerateVolPct: % of days in 0.5-3% range
-            - Baseline: 2-year rolling median
-            - Threshold: Baseline * 1.10
-            - Signal_Raw: 1 if above threshold, 0 otherwise
-            - Signal_Modified: After rally filter
-            - In_Recovery_Mode: Boolean for ORANGE state
-            - State: 'GREEN', 'RED', or 'ORANGE'
+        (signal_modified, in_recovery_mode) arrays: int 0/1 after the
+        rally filter, and bool for the ORANGE state
     """
-    df = df.copy()
+    n = len(close)
+    signal_modified = [0] * n
+    in_recovery_mode = [False] * n
     
-    # Calculate moderate volatility %
-    def calculate_moderate_volatility_pct(returns_window):
-        if len(returns_window) < 20:
-            return np.nan
-        abs_returns = np.abs(returns_window)
-        moderate_days = ((abs_returns >= 0.5) & (abs_returns <= 3.0)).sum()
-        return (moderate_days / len(returns_window)) * 100
-    
-    window_size = 30
-    df['ModerateVolPct'] = np.nan
-    for i in range(window_size, len(df)):
-        window = df.iloc[i-window_size:i]['Return'].values
-        df.loc[i, 'ModerateVolPct'] = calculate_moderate_volatility_pct(window)
-    
-    # 2-year rolling baseline (504 trading days)
-    baseline_window = 504
-    df['Baseline'] = np.nan
-    df['Threshold'] = np.nan
-    
-    for i in range(baseline_window, len(df)):
-        historical_mod_vol = df.iloc[i-baseline_window:i]['ModerateVolPct'].dropna()
-        if len(historical_mod_vol) > 100:
-            baseline = historical_mod_vol.median()
-            df.loc[i, 'Baseline'] = baseline
-            df.loc[i, 'Threshold'] = baseline * 1.10
-    
-    df['Signal_Raw'] = (df['ModerateVolPct'] > df['Threshold']).astype(int)
-    
-    # Rally filter
-    df['Signal_Modified'] = 0
+    # Rally filter state
     in_red = False
     red_entry_price = None
     
-    for i in range(len(df)):
-        if pd.isna(df.iloc[i]['Signal_Raw']):
-            continue
-        
-        raw_signal = df.iloc[i]['Signal_Raw']
-        current_price = df.iloc[i]['Close']
-        
-        if in_red:
-            rally_from_entry = ((current_price - red_entry_price) / red_entry_price) * 100
-            if rally_from_entry > 1.0:
-                in_red = False
-                red_entry_price = None
-                df.loc[i, 'Signal_Modified'] = 0
-            elif raw_signal == 0:
-                in_red = False
-                red_entry_price = None
-                df.loc[i, 'Signal_Modified'] = 0
-            else:
-                df.loc[i, 'Signal_Modified'] = 1
-        else:
-            if raw_signal == 1:
-                in_red = True
-                red_entry_price = current_price
-                df.loc[i, 'Signal_Modified'] = 1
-            else:
-                df.loc[i, 'Signal_Modified'] = 0
-    
-    # ORANGE recovery mode
-    df['In_Recovery_Mode'] = False
+    # Recovery mode state
     in_signal = False
     in_recovery = False
     signal_start_price = None
@@ -103,9 +51,23 @@ def calculate_signal(df):
     peak_locked = False
     recovery_target = None
     
-    for i in range(len(df)):
-        current_price = df.iloc[i]['Close']
-        signal_on = df.iloc[i]['Signal_Modified'] == 1
+    for i, (current_price, raw_signal) in enumerate(zip(close.tolist(), signal_raw.tolist())):
+        # Rally filter: RED until the market rallies >1% from entry or the raw signal clears
+        if in_red:
+            rally_from_entry = ((current_price - red_entry_price) / red_entry_price) * 100
+            if rally_from_entry > 1.0 or raw_signal == 0:
+                in_red = False
+                red_entry_price = None
+            else:
+                signal_modified[i] = 1
+        elif raw_signal == 1:
+            in_red = True
+            red_entry_price = current_price
+            signal_modified[i] = 1
+        
+        # Recovery mode: ORANGE after a >1% drawdown from the signal start,
+        # until price clears the peak of a >10% rally off the low
+        signal_on = signal_modified[i] == 1
         
         if signal_on and not in_signal:
             in_signal = True
@@ -129,7 +91,7 @@ def calculate_signal(df):
                 in_signal = False
         
         if in_recovery:
-            df.loc[i, 'In_Recovery_Mode'] = True
+            in_recovery_mode[i] = True
             if current_price < recovery_low:
                 recovery_low = current_price
             if not peak_locked:
@@ -143,19 +105,69 @@ def calculate_signal(df):
                 recovery_target = None
                 recovery_low = None
     
+    return np.array(signal_modified), np.array(in_recovery_mode)
+
+
+def calculate_signal(df):
+    """
+    Calculate moderate volatility signal states.
+    
+    Args:
+        df: DataFrame with columns: Date, Close, Return
+        
+    Returns:
+        DataFrame with added columns:
+            - ModerateVolPct: % of days in 0.5-3% range
+            - Baseline: 2-year rolling median
+            - Threshold: Baseline * 1.10
+            - Signal_Raw: 1 if above threshold, 0 otherwise
+            - Signal_Modified: After rally filter
+            - In_Recovery_Mode: Boolean for ORANGE state
+            - State: categorical 'GREEN', 'RED', or 'ORANGE'
+    """
+    # Moderate volatility %: share of the previous 30 days (not including
+    # today) with |return| in 0.5-3%, from a running count of such days
+    window_size = 30
+    abs_returns = np.abs(df['Return'].to_numpy())
+    moderate_count = np.concatenate([[0], np.cumsum((abs_returns >= 0.5) & (abs_returns <= 3.0))])
+    mod_vol = np.full(len(df), np.nan)
+    mod_vol[window_size:] = (moderate_count[window_size:-1] - moderate_count[:-window_size - 1]) / window_size * 100
+    
+    # 2-year rolling baseline (504 trading days): median of the defined
+    # ModerateVolPct values in the 504 days before today, once there are > 100
+    baseline_window = 504
+    baselines = (pd.Series(mod_vol).rolling(baseline_window, min_periods=101).median()
+                 .shift(1).to_numpy(copy=True))
+    baselines[:baseline_window] = np.nan
+    threshold = baselines * 1.10
+    
+    signal_raw = (mod_vol > threshold).astype(int)
+    
+    # Rally filter and ORANGE recovery mode, in one pass over the prices
+    signal_modified, in_recovery_mode = _run_state_machines(df['Close'].to_numpy(), signal_raw)
+    
     # Assign final states
-    df['State'] = 'GREEN'
-    for i in range(len(df)):
-        if df.iloc[i]['Signal_Modified'] == 1:
-            df.loc[i, 'State'] = 'RED'
-        elif df.iloc[i]['In_Recovery_Mode']:
-            df.loc[i, 'State'] = 'ORANGE'
+    state = np.select([signal_modified == 1, in_recovery_mode],
+                      [STATES.index('RED'), STATES.index('ORANGE')],
+                      default=STATES.index('GREEN')).astype(np.int8)
+    
+    # Only the new columns are added; the caller's frame is left untouched
+    df = df.assign(
+        ModerateVolPct=mod_vol,
+        Baseline=baselines,
+        Threshold=threshold,
+        Signal_Raw=signal_raw,
+        Signal_Modified=signal_modified,
+        In_Recovery_Mode=in_recovery_mode,
+        State=pd.Categorical.from_codes(state, categories=STATES)
+    )
     
     # Print summary
+    green_days, orange_days, red_days = np.bincount(state, minlength=len(STATES))
     print(f"✓ Signal calculated:")
-    print(f"  RED: {(df['State'] == 'RED').sum():,} days ({(df['State'] == 'RED').sum()/len(df)*100:.1f}%)")
-    print(f"  ORANGE: {(df['State'] == 'ORANGE').sum():,} days ({(df['State'] == 'ORANGE').sum()/len(df)*100:.1f}%)")
-    print(f"  GREEN: {(df['State'] == 'GREEN').sum():,} days ({(df['State'] == 'GREEN').sum()/len(df)*100:.1f}%)")
+    print(f"  RED: {red_days:,} days ({red_days/len(df)*100:.1f}%)")
+    print(f"  ORANGE: {orange_days:,} days ({orange_days/len(df)*100:.1f}%)")
+    print(f"  GREEN: {green_days:,} days ({green_days/len(df)*100:.1f}%)")
     
     return df
 
@@ -14,65 +14,118 @@ NOTE: This version does NOT include the 3-day lag filter.
 """
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# State column categories; codes index into this list
+STATES = ['GREEN', 'RED']
 
 
 def calculate_signal(df):
     """
     Calculate power law deviation signal using 60-day rolling window.
     
+    All windows are fit without a per-day loop: the 60-day windows are
+    stacked into a 2D view, sorted row-wise, and the log-log tail regression
+    is solved in closed form from masked row sums (same result as np.polyfit
+    per window).
+    
     Args:
         df: DataFrame with columns: Date, Close, Return
         
     Returns:
         DataFrame with added columns:
             - AbsReturn: Absolute value of returns
-            - State: 'RED' (deviation detected) or 'GREEN' (normal)
+            - State: categorical 'RED' (deviation detected) or 'GREEN' (normal)
     """
-    df = df.copy()
-    
-    df['AbsReturn'] = np.abs(df['Return'])
-    df['State'] = 'GREEN'  # Default to GREEN
+    abs_returns = np.abs(df['Return'].to_numpy(dtype=float))
+    state = np.zeros(len(df), dtype=np.int8)  # Default to GREEN
     
     window_days = 60
     
-    for i in range(window_days, len(df)):
-        # Get last 60 days
-        window_data = df.iloc[i-window_days:i].copy()
-        abs_returns_window = np.abs(window_data['Return'].values)
+    # Sort all returns once and work with their integer ranks, so each
+    # window can be sorted on ints and actual CCDFs become searchsorted calls
+    unique_returns, ranks = np.unique(abs_returns, return_inverse=True)
+    ranks = ranks.ravel()
+    
+    if len(abs_returns) <= window_days:
+        rank_windows = np.empty((0, window_days), dtype=ranks.dtype)
+    else:
+        # Row j holds the 60 days before day j + window_days
+        rank_windows = sliding_window_view(ranks, window_days)[:-1]
+    n_windows = len(rank_windows)
+    
+    n = window_days
+    # Windows are kept in ascending order, so the CCDF runs n/n ... 1/n
+    log_ccdf = np.log(np.arange(n, 0, -1) / n)
+    # Tail points are the top k of each window, so the log_y sums only
+    # depend on the tail length k
+    cum_log_ccdf = np.concatenate([[0.0], np.cumsum(log_ccdf[::-1])])
+    
+    # Log each distinct return once; windows gather it by rank. Returns
+    # outside the tail (<= 0.5%) map to 0 so they drop out of the sums.
+    tail_rank = np.searchsorted(unique_returns, 0.5, side='right')
+    log_returns = np.zeros(len(unique_returns))
+    log_returns[tail_rank:] = np.log(unique_returns[tail_rank:])
+    
+    # Tail size per window from a running count - no per-window mask needed
+    in_tail = np.concatenate([[0], np.cumsum(ranks >= tail_rank)])
+    k = in_tail[window_days:-1] - in_tail[:n_windows]
+    
+    sorted_ranks = np.empty_like(rank_windows)
+    sx = np.empty(n_windows)
+    sxx = np.empty(n_windows)
+    sxy = np.empty(n_windows)
+    
+    # Work through the windows in blocks so the per-block temporaries stay
+    # cache-sized instead of materializing several N x 60 arrays at once
+    block = 4096
+    for start in range(0, n_windows, block):
+        rows = slice(start, start + block)
         
-        # Calculate CCDF for window
-        sorted_returns = np.sort(abs_returns_window)[::-1]
-        n = len(sorted_returns)
-        ccdf = np.arange(1, n+1) / n
+        # Calculate CCDF for each window (ascending sort, (n - position) / n)
+        sorted_block = np.sort(rank_windows[rows], axis=1)
+        sorted_ranks[rows] = sorted_block
         
         # Fit power law to tail (returns > 0.5%)
-        valid_mask = (sorted_returns > 0) & (ccdf > 0)
-        tail_mask = sorted_returns[valid_mask] > 0.5
-        
-        if tail_mask.sum() < 10:
-            # Not enough tail data to fit
-            continue
-        
-        log_x = np.log(sorted_returns[valid_mask][tail_mask])
-        log_y = np.log(ccdf[valid_mask][tail_mask])
-        slope, intercept = np.polyfit(log_x, log_y, 1)
-        
-        # Check today's return
-        today_abs_return = df.iloc[i]['AbsReturn']
-        
-        if today_abs_return >= 0.5:
-            # Predict where this return should be on power law
-            predicted_ccdf = np.exp(intercept) * today_abs_return ** slope
-            
-            # Where is it actually?
-            actual_ccdf = (abs_returns_window >= today_abs_return).sum() / n
-            
-            # Set to RED if actual > predicted (more frequent than expected)
-            if actual_ccdf > predicted_ccdf:
-                df.loc[i, 'State'] = 'RED'
-    
-    red_days = (df['State'] == 'RED').sum()
-    green_days = (df['State'] == 'GREEN').sum()
+        log_x = log_returns[sorted_block]
+        sx[rows] = log_x.sum(axis=1)
+        sxx[rows] = np.einsum('ij,ij->i', log_x, log_x)
+        sxy[rows] = log_x @ log_ccdf
+    
+    sy = cum_log_ccdf[k]
+    
+    # Not enough tail data to fit -> no signal
+    fitted = k >= 10
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (k * sxy - sx * sy) / (k * sxx - sx * sx)
+        intercept = (sy - slope * sx) / k
+    
+    # Check today's return
+    today_abs_return = abs_returns[window_days:]
+    
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # Predict where this return should be on power law
+        predicted_ccdf = np.exp(intercept) * today_abs_return ** slope
+    
+    # Where is it actually? Offsetting each row by its index makes the
+    # flattened ranks one globally sorted array, so a single searchsorted
+    # counts the window values below today's return for every day
+    offsets = np.arange(n_windows) * len(unique_returns)
+    flat_ranks = (sorted_ranks + offsets[:, None]).ravel()
+    below = np.searchsorted(flat_ranks, ranks[window_days:] + offsets, side='left')
+    below -= np.arange(n_windows) * n
+    actual_ccdf = (n - below) / n
+    
+    # Set to RED if actual > predicted (more frequent than expected)
+    red = fitted & (today_abs_return >= 0.5) & (actual_ccdf > predicted_ccdf)
+    state[window_days:][red] = STATES.index('RED')
+    
+    # Only the new columns are added; the caller's frame is left untouched
+    df = df.assign(AbsReturn=abs_returns, State=pd.Categorical.from_codes(state, categories=STATES))
+    
+    red_days = int(red.sum())
+    green_days = len(df) - red_days
     red_pct = red_days / len(df) * 100
     green_pct = green_days / len(df) * 100
     
@@ -16,29 +16,23 @@ Strategy:
 """
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from power_law import calculate_alpha
+
+# State column categories; codes index into this list
+STATES = ['GREEN', 'ORANGE', 'RED']
 
 
 def calculate_alpha_and_fit(returns, min_return=0.5):
     """Calculate alpha and R² for a set of returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    
-    if tail_mask.sum() < 10:
+    x, y, alpha, intercept = calculate_alpha(returns, min_return=min_return, min_points=10)
+    if x is None:
         return None, None
     
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    
     log_x = np.log(x)
     log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
-    
-    predicted_log_y = slope * log_x + intercept
+    predicted_log_y = intercept - alpha * log_x
     ss_res = np.sum((log_y - predicted_log_y) ** 2)
     ss_tot = np.sum((log_y - np.mean(log_y)) ** 2)
     r_squared = 1 - (ss_res / ss_tot)
@@ -46,32 +40,45 @@ def calculate_alpha_and_fit(returns, min_return=0.5):
     return alpha, r_squared
 
 
-def calculate_fit_with_fixed_alpha(returns, fixed_alpha, min_return=0.5):
-    """Calculate R² using a fixed alpha"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    
-    if tail_mask.sum() < 10:
-        return None
-    
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    
-    log_x = np.log(x)
-    log_y = np.log(y)
-    
-    slope = -fixed_alpha
-    intercept = np.mean(log_y - slope * log_x)
+def rolling_r2_fixed_alpha(returns, window, fixed_alpha, min_return=0.5, min_points=10):
+    """
+    R² of the fixed-alpha fit for every trailing window, without a per-day loop.
     
-    predicted_log_y = slope * log_x + intercept
-    ss_res = np.sum((log_y - predicted_log_y) ** 2)
-    ss_tot = np.sum((log_y - np.mean(log_y)) ** 2)
-    r_squared = 1 - (ss_res / ss_tot)
+    For each i, the R² over the |r| > min_return tail of returns[i-window:i]
+    of a log-log line whose slope is fixed at -fixed_alpha and whose
+    intercept is fit by least squares. The windows are stacked into a 2D
+    view and sorted row-wise, and the intercept, residual and total sums of
+    squares are masked row sums over the tail.
     
+    Returns:
+        np.ndarray of len(returns), NaN where there is no full window or
+        fewer than min_points tail values
+    """
+    r_squared = np.full(len(returns), np.nan)
+    if len(returns) <= window:
+        return r_squared
+    
+    # Row j holds the window before day j + window, in descending order,
+    # so the tail is a prefix with CCDF ranks 1..k out of window
+    sorted_returns = np.sort(np.abs(sliding_window_view(returns, window)[:-1]), axis=1)[:, ::-1]
+    tail = sorted_returns > min_return
+    k = tail.sum(axis=1)
+    fitted = k >= min_points
+    tail, k = tail[fitted], k[fitted]
+    log_x = np.log(np.where(tail, sorted_returns[fitted], 1.0))
+    log_y = np.log(np.arange(1, window + 1) / window)
+    
+    # With the slope fixed at -alpha, the intercept is the mean of log_y + alpha * log_x
+    offset = log_y + fixed_alpha * log_x
+    intercept = np.where(tail, offset, 0.0).sum(axis=1) / k
+    residuals = np.where(tail, offset - intercept[:, None], 0.0)
+    ss_res = np.einsum('ij,ij->i', residuals, residuals)
+    
+    mean_log_y = np.where(tail, log_y, 0.0).sum(axis=1) / k
+    centred = np.where(tail, log_y - mean_log_y[:, None], 0.0)
+    ss_tot = np.einsum('ij,ij->i', centred, centred)
+    
+    r_squared[window:][fitted] = 1 - ss_res / ss_tot
     return r_squared
 
 
@@ -85,73 +92,56 @@ def generate_signal(df, window=21, threshold_sigma=1.0):
         threshold_sigma: Threshold in standard deviations (default 1.0)
         
     Returns:
-        DataFrame with State column added:
+        DataFrame with categorical State column added:
         - 'GREEN': 2x long (R² improving - power law strengthening)
         - 'ORANGE': 1x long (neutral)
         - 'RED': short (R² degrading - power law weakening)
     """
-    df = df.copy()
+    returns = df['Return'].to_numpy(dtype=float)
     
     # Calculate global alpha from full dataset
-    global_alpha, _ = calculate_alpha_and_fit(df['Return'].values)
+    global_alpha, _ = calculate_alpha_and_fit(returns)
     
     # Calculate rolling R² using global alpha
-    global_r2 = []
-    for i in range(window, len(df)):
-        r = calculate_fit_with_fixed_alpha(df.iloc[i-window:i]['Return'].values, global_alpha)
-        global_r2.append(r if r is not None else np.nan)
+    global_r2 = rolling_r2_fixed_alpha(returns, window, global_alpha)
     
-    # Add to dataframe
-    df['GlobalR2'] = [np.nan] * window + global_r2
+    # Work on the days where GlobalR2 is not NaN (like original logic),
+    # with the derivative taken between consecutive such days
+    valid = ~np.isnan(global_r2)
+    deriv = np.diff(global_r2[valid], prepend=np.nan)
     
-    # Work on subset where GlobalR2 is not NaN (like original logic)
-    df_subset = df[df['GlobalR2'].notna()].copy().reset_index(drop=True)
-    
-    # Calculate derivative
-    df_subset['R2_derivative'] = df_subset['GlobalR2'].diff()
-    
-    # Calculate threshold
-    derivative_clean = df_subset['R2_derivative'].dropna()
-    std = derivative_clean.std()
+    # Calculate threshold (sample std, skipping the leading NaN)
+    std = pd.Series(deriv).std()
     threshold_pos = threshold_sigma * std
     threshold_neg = -threshold_sigma * std
     
-    # Find breach signals on the subset
-    signals = []
-    for i in range(len(df_subset)):
-        deriv = df_subset.iloc[i]['R2_derivative']
-        if pd.notna(deriv):
-            if deriv > threshold_pos:
-                signals.append((i, 'green'))
-            elif deriv < threshold_neg:
-                signals.append((i, 'red'))
-    
-    # Color regions between consecutive matching signals
-    colored_regions = []
-    for i in range(len(signals) - 1):
-        start_idx, start_color = signals[i]
-        end_idx, end_color = signals[i + 1]
-        
-        if start_color == end_color:
-            colored_regions.append((start_idx, end_idx, start_color))
-    
-    # Create state array on the subset
-    state_subset = ['orange'] * len(df_subset)
-    for start_idx, end_idx, color in colored_regions:
-        for j in range(start_idx, end_idx + 1):
-            state_subset[j] = color
-    
-    df_subset['State'] = [s.upper() for s in state_subset]
-    
-    # Map back to original dataframe using Date
-    df['State'] = 'ORANGE'  # Default for rows with NaN GlobalR2
-    date_to_state = dict(zip(df_subset['Date'], df_subset['State']))
-    df['State'] = df['Date'].map(date_to_state).fillna('ORANGE')
+    # Find breach signals on the valid days (NaN derivatives compare False),
+    # coded 1 for green and -1 for red, in chronological order
+    green_idx = np.flatnonzero(deriv > threshold_pos)
+    red_idx = np.flatnonzero(deriv < threshold_neg)
+    signal_idx = np.concatenate([green_idx, red_idx])
+    signal_color = np.concatenate([np.ones(len(green_idx), dtype=np.int8),
+                                   np.full(len(red_idx), -1, dtype=np.int8)])
+    order = np.argsort(signal_idx, kind='stable')
+    signal_idx, signal_color = signal_idx[order], signal_color[order]
+    
+    # Color regions between consecutive matching signals (0 = orange)
+    match = signal_color[:-1] == signal_color[1:]
+    regime = np.zeros(len(deriv), dtype=np.int8)
+    for start_idx, end_idx, color in zip(signal_idx[:-1][match], signal_idx[1:][match],
+                                         signal_color[:-1][match]):
+        regime[start_idx:end_idx + 1] = color
+    
+    # Map back to all rows (NaN GlobalR2 rows stay ORANGE)
+    state = np.full(len(df), STATES.index('ORANGE'), dtype=np.int8)
+    state[valid] = np.select(
+        [regime == 1, regime == -1], [STATES.index('GREEN'), STATES.index('RED')],
+        default=STATES.index('ORANGE'))
+    # Only the new columns are added; the caller's frame is left untouched
+    df = df.assign(GlobalR2=global_r2, State=pd.Categorical.from_codes(state, categories=STATES))
     
     # Print summary
-    red_days = (df['State'] == 'RED').sum()
-    orange_days = (df['State'] == 'ORANGE').sum()
-    green_days = (df['State'] == 'GREEN').sum()
+    green_days, orange_days, red_days = np.bincount(state, minlength=len(STATES))
     
     print(f"✓ R² derivative signal calculated:")
     print(f"  RED: {red_days:,} days ({red_days/len(df)*100:.1f}%)")
@@ -1,58 +1,21 @@
 import sys
 sys.path.append('code/data')
+sys.path.append('code/analysis')
 from load_data import load_asset
+from identify_drawdowns import identify_unique_drawdowns
 import numpy as np
 import pandas as pd
 
-def identify_unique_drawdowns(df, threshold_pct=15):
-    """Identify drawdowns, removing duplicates"""
-    df['Running_Max'] = df['Close'].expanding().max()
-    df['Drawdown'] = (df['Close'] - df['Running_Max']) / df['Running_Max'] * 100
-    
-    troughs = []
-    i = 0
-    while i < len(df):
-        if df.iloc[i]['Drawdown'] <= -threshold_pct:
-            start = i
-            while i < len(df) and df.iloc[i]['Drawdown'] <= -threshold_pct * 0.5:
-                i += 1
-            
-            trough_window = df.iloc[start:i+1]
-            trough_idx = trough_window['Drawdown'].idxmin()
-            
-            peak_window = df.iloc[max(0, trough_idx-756):trough_idx]
-            peak_idx = peak_window['Close'].idxmax()
-            
-            troughs.append({
-                'peak_date': df.iloc[peak_idx]['Date'],
-                'trough_date': df.iloc[trough_idx]['Date'],
-                'drawdown_pct': df.iloc[trough_idx]['Drawdown'],
-                'peak_idx': peak_idx,
-                'trough_idx': trough_idx
-            })
-        i += 1
-    
-    seen_troughs = set()
-    unique = []
-    for dd in troughs:
-        if dd['trough_idx'] not in seen_troughs:
-            unique.append(dd)
-            seen_troughs.add(dd['trough_idx'])
-    
-    return unique
-
 def calculate_ccdf_at_thresholds(returns, thresholds):
-    """Calculate CCDF values at specific threshold points"""
+    """Calculate CCDF values at specific threshold points, as an array aligned with thresholds"""
     abs_returns = np.abs(returns)
     n = len(abs_returns)
     
-    ccdf_values = {}
-    for threshold in thresholds:
-        # P(|return| >= threshold)
-        count = (abs_returns >= threshold).sum()
-        ccdf_values[threshold] = count / n if n > 0 else 0
+    if n == 0:
+        return np.zeros(len(thresholds))
     
-    return ccdf_values
+    # P(|return| >= threshold) for every threshold in one (returns, thresholds) comparison
+    return (abs_returns[:, None] >= thresholds).sum(axis=0) / n
 
 # Load SPX
 print("Loading SPX...")
@@ -62,12 +25,13 @@ df = load_asset('_spx_d.csv')
 drawdowns = identify_unique_drawdowns(df, threshold_pct=15)
 
 # Exclude exogenous shocks
-exogenous = ['1987', '2020']
-endogenous_dd = [dd for dd in drawdowns if not any(yr in dd['peak_date'].strftime('%Y') for yr in exogenous)]
+exogenous = {1987, 2020}
+endogenous_dd = [dd for dd in drawdowns if dd['peak_date'].year not in exogenous]
 print(f"Analyzing {len(endogenous_dd)} endogenous drawdowns\n")
 
-# Test at multiple threshold points
-thresholds = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+# Test at multiple threshold points (and the ones shown in the detail lines)
+THRESHOLDS = np.array([0.5, 1.0, 1.5, 2.0, 2.5, 3.0])
+DETAIL_IDX = np.searchsorted(THRESHOLDS, [0.5, 1.5, 3.0])
 lead_time = 126  # 6 months
 
 results = []
@@ -82,12 +46,11 @@ for dd in endogenous_dd:
     normal_returns = df.iloc[peak_idx - lead_time * 2:peak_idx - lead_time]['Return'].values
     
     # Calculate CCDF at each threshold
-    leadup_ccdf = calculate_ccdf_at_thresholds(leadup_returns, thresholds)
-    normal_ccdf = calculate_ccdf_at_thresholds(normal_returns, thresholds)
+    leadup_ccdf = calculate_ccdf_at_thresholds(leadup_returns, THRESHOLDS)
+    normal_ccdf = calculate_ccdf_at_thresholds(normal_returns, THRESHOLDS)
     
     # Calculate mean deviation (average difference across thresholds)
-    diffs = [leadup_ccdf[t] - normal_ccdf[t] for t in thresholds]
-    mean_diff = np.mean(diffs)
+    mean_diff = (leadup_ccdf - normal_ccdf).mean()
     
     results.append({
         'peak_date': dd['peak_date'],
@@ -109,8 +72,8 @@ for r in results:
     # Show detail for a few
     if abs(r['mean_ccdf_diff']) > 0.05:
         print(f"  Detail: ", end='')
-        for t in [0.5, 1.5, 3.0]:
-            print(f"{t}%: {r['leadup_ccdf'][t]:.2f} vs {r['normal_ccdf'][t]:.2f}  ", end='')
+        for i in DETAIL_IDX:
+            print(f"{THRESHOLDS[i]}%: {r['leadup_ccdf'][i]:.2f} vs {r['normal_ccdf'][i]:.2f}  ", end='')
         print()
 
 # Summary
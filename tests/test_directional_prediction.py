@@ -1,41 +1,11 @@
 import sys
 sys.path.append('code/data')
+sys.path.append('code/analysis')
 from load_data import load_asset
+from ccdf_gap import batch_actual_vs_predicted
 import numpy as np
 import pandas as pd
 
-def calculate_alpha(returns, min_return=0.5, min_points=5):
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < min_points:
-        return None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    return -slope, intercept
-
-def measure_actual_vs_predicted(df, start_idx, end_idx, thresholds=[0.5, 1.0, 1.5, 2.0]):
-    gaps = []
-    for i in range(start_idx, end_idx):
-        if i < 60:
-            continue
-        returns = df.iloc[i-60:i]['Return'].values
-        alpha, intercept = calculate_alpha(returns)
-        if alpha is None:
-            continue
-        abs_returns = np.abs(returns)
-        for threshold in thresholds:
-            actual_pct = (abs_returns >= threshold).sum() / len(abs_returns)
-            predicted_pct = np.exp(intercept) * (threshold ** (-alpha))
-            gap = actual_pct - predicted_pct
-            gaps.append(gap)
-    return np.mean(gaps) if len(gaps) > 0 else np.nan
-
 def analyze_all_periods(filename, asset_name):
     print(f"\nAnalyzing {asset_name}...")
     df = load_asset(filename)
@@ -43,43 +13,38 @@ def analyze_all_periods(filename, asset_name):
     lead_time = 126  # 6 months
     forward_time = 126  # 6 months forward
     
-    results = []
-    
-    # Test every valid period (every 20 days to keep it manageable)
-    for idx in range(lead_time * 2, len(df) - forward_time, 20):
-        # Measure compression
-        leadup_gap = measure_actual_vs_predicted(df, idx - lead_time, idx)
-        normal_gap = measure_actual_vs_predicted(df, idx - lead_time * 2, idx - lead_time)
-        
-        if np.isnan(leadup_gap) or np.isnan(normal_gap):
-            continue
-        
-        is_compressed = leadup_gap < normal_gap
-        
-        # Measure what happened in 6 months BEFORE this period
-        past_return = (df.iloc[idx]['Close'] - df.iloc[idx - lead_time]['Close']) / df.iloc[idx - lead_time]['Close'] * 100
-        
-        # Measure what happened in 6 months AFTER this period  
-        future_return = (df.iloc[idx + forward_time]['Close'] - df.iloc[idx]['Close']) / df.iloc[idx]['Close'] * 100
-        
-        # Determine if reversal or continuation
-        past_up = past_return > 0
-        future_up = future_return > 0
-        is_reversal = past_up != future_up
-        
-        results.append({
-            'Asset': asset_name,
-            'Date': df.iloc[idx]['Date'].strftime('%Y-%m-%d'),
-            'Compressed': is_compressed,
-            'Past_Return': past_return,
-            'Future_Return': future_return,
-            'Past_Direction': 'UP' if past_up else 'DOWN',
-            'Future_Direction': 'UP' if future_up else 'DOWN',
-            'Reversal': is_reversal
-        })
+    # Test every valid period (every 20 days to keep it manageable),
+    # measuring compression for all of them in one batch
+    period_idx = np.arange(lead_time * 2, len(df) - forward_time, 20)
+    leadup_gaps, normal_gaps = batch_actual_vs_predicted(df, np.stack([
+        np.column_stack([period_idx - lead_time, period_idx]),
+        np.column_stack([period_idx - lead_time * 2, period_idx - lead_time])]))
+    
+    valid = ~(np.isnan(leadup_gaps) | np.isnan(normal_gaps))
+    idx = period_idx[valid]
+    close = df['Close'].to_numpy(dtype=np.float64)
+    
+    # Measure what happened in 6 months BEFORE and AFTER each period
+    past_return = (close[idx] - close[idx - lead_time]) / close[idx - lead_time] * 100
+    future_return = (close[idx + forward_time] - close[idx]) / close[idx] * 100
+    
+    # Determine if reversal or continuation
+    past_up = past_return > 0
+    future_up = future_return > 0
+    
+    results = pd.DataFrame({
+        'Asset': asset_name,
+        'Date': pd.DatetimeIndex(df['Date'].to_numpy()[idx]).strftime('%Y-%m-%d'),
+        'Compressed': leadup_gaps[valid] < normal_gaps[valid],
+        'Past_Return': past_return,
+        'Future_Return': future_return,
+        'Past_Direction': np.where(past_up, 'UP', 'DOWN'),
+        'Future_Direction': np.where(future_up, 'UP', 'DOWN'),
+        'Reversal': past_up != future_up
+    })
     
     print(f"  Analyzed {len(results)} periods")
-    return pd.DataFrame(results)
+    return results
 
 # Test on SPX first
 result = analyze_all_periods('_spx_d.csv', 'SPX')
@@ -1,94 +1,21 @@
 import sys
 sys.path.append('code/data')
-from load_data import load_asset
+sys.path.append('code/analysis')
+from identify_drawdowns import identify_unique_drawdowns
+from rolling_deviation_cache import get_mean_deviation
 import numpy as np
 import pandas as pd
 
-def calculate_alpha(returns, min_return=0.5, min_points=5):
-    """Calculate power law alpha from returns"""
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < min_points:
-        return None, None, None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    alpha = -slope
-    return x, y, alpha, intercept
-
-def calculate_mean_deviation_series(df, window=60):
-    """Calculate mean CCDF deviation for each day"""
-    mean_deviations = []
-    for i in range(len(df)):
-        if i < window:
-            mean_deviations.append(np.nan)
-        else:
-            returns = df.iloc[i-window:i]['Return'].values
-            x, y, alpha, intercept = calculate_alpha(returns)
-            
-            if alpha is not None:
-                power_law_fit = np.exp(intercept) * (x ** (-alpha))
-                deviation = y - power_law_fit
-                mask = (x >= 0.5) & (x <= 3.0)
-                if mask.sum() > 0:
-                    mean_dev = np.mean(deviation[mask])
-                    mean_deviations.append(mean_dev)
-                else:
-                    mean_deviations.append(np.nan)
-            else:
-                mean_deviations.append(np.nan)
-    return mean_deviations
-
-def identify_unique_drawdowns(df, threshold_pct=15):
-    """Identify drawdowns"""
-    df['Running_Max'] = df['Close'].expanding().max()
-    df['Drawdown'] = (df['Close'] - df['Running_Max']) / df['Running_Max'] * 100
-    
-    troughs = []
-    i = 0
-    while i < len(df):
-        if df.iloc[i]['Drawdown'] <= -threshold_pct:
-            start = i
-            while i < len(df) and df.iloc[i]['Drawdown'] <= -threshold_pct * 0.5:
-                i += 1
-            
-            trough_window = df.iloc[start:i+1]
-            trough_idx = trough_window['Drawdown'].idxmin()
-            peak_window = df.iloc[max(0, trough_idx-756):trough_idx]
-            peak_idx = peak_window['Close'].idxmax()
-            
-            troughs.append({
-                'peak_date': df.iloc[peak_idx]['Date'],
-                'trough_date': df.iloc[trough_idx]['Date'],
-                'drawdown_pct': df.iloc[trough_idx]['Drawdown'],
-                'peak_idx': peak_idx,
-                'trough_idx': trough_idx
-            })
-        i += 1
-    
-    seen_troughs = set()
-    unique = []
-    for dd in troughs:
-        if dd['trough_idx'] not in seen_troughs:
-            unique.append(dd)
-            seen_troughs.add(dd['trough_idx'])
-    
-    return unique
-
 # Load SPX and calculate mean deviation
 print("Loading SPX and calculating mean deviation...")
-df = load_asset('_spx_d.csv')
-df['Mean_Deviation'] = calculate_mean_deviation_series(df)
+# The 60-day fit is cached on disk with the deviation plots' frames, so re-runs skip it
+df = get_mean_deviation('_spx_d.csv', min_date=None)
+mean_deviation = df['Mean_Deviation'].to_numpy()
 
 # Identify drawdowns
 drawdowns = identify_unique_drawdowns(df, threshold_pct=15)
-exogenous = ['1987', '2020']
-endogenous_dd = [dd for dd in drawdowns if not any(yr in dd['peak_date'].strftime('%Y') for yr in exogenous)]
+exogenous = {1987, 2020}
+endogenous_dd = [dd for dd in drawdowns if dd['peak_date'].year not in exogenous]
 
 print(f"\nAnalyzing {len(endogenous_dd)} endogenous drawdowns")
 print("\nHypothesis: Before crashes, market spends MORE time in negative deviation")
@@ -97,27 +24,27 @@ print("(More time deviating from its own power law = tail risk building)\n")
 lead_time = 126  # 6 months
 results = []
 
-for dd in endogenous_dd:
-    peak_idx = dd['peak_idx']
-    
-    if peak_idx < lead_time * 2:
-        continue
-    
-    # Calculate % time in negative deviation
-    leadup_deviations = df.iloc[peak_idx - lead_time:peak_idx]['Mean_Deviation'].values
-    normal_deviations = df.iloc[peak_idx - lead_time * 2:peak_idx - lead_time]['Mean_Deviation'].values
-    
-    # Remove NaNs
-    leadup_deviations = leadup_deviations[~np.isnan(leadup_deviations)]
-    normal_deviations = normal_deviations[~np.isnan(normal_deviations)]
-    
-    if len(leadup_deviations) == 0 or len(normal_deviations) == 0:
+# Running counts of defined (non-NaN) and negative days, so every
+# lead-up/normal span is two lookups into each
+defined_days = np.concatenate([[0], np.cumsum(~np.isnan(mean_deviation))])
+negative_days = np.concatenate([[0], np.cumsum(mean_deviation < 0)])
+
+endogenous_dd = [dd for dd in endogenous_dd if dd['peak_idx'] >= lead_time * 2]
+peaks = np.array([dd['peak_idx'] for dd in endogenous_dd], dtype=np.int64)
+spans = np.stack([np.column_stack([peaks - lead_time, peaks]),
+                  np.column_stack([peaks - lead_time * 2, peaks - lead_time])])
+n_defined = defined_days[spans[..., 1]] - defined_days[spans[..., 0]]
+n_negative = negative_days[spans[..., 1]] - negative_days[spans[..., 0]]
+
+# % of time negative, over the defined days of each span
+with np.errstate(invalid='ignore', divide='ignore'):
+    leadup_pcts, normal_pcts = n_negative / n_defined * 100
+
+for dd, leadup_pct_negative, normal_pct_negative, (n_leadup, n_normal) in zip(
+        endogenous_dd, leadup_pcts, normal_pcts, n_defined.T):
+    if n_leadup == 0 or n_normal == 0:
         continue
     
-    # % of time negative
-    leadup_pct_negative = (leadup_deviations < 0).sum() / len(leadup_deviations) * 100
-    normal_pct_negative = (normal_deviations < 0).sum() / len(normal_deviations) * 100
-    
     diff = leadup_pct_negative - normal_pct_negative
     
     results.append({
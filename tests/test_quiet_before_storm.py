@@ -1,50 +1,11 @@
 import sys
 sys.path.append('code/data')
+sys.path.append('code/analysis')
 from load_data import load_asset
+from identify_drawdowns import identify_unique_drawdowns
 import numpy as np
 import pandas as pd
 
-def identify_unique_drawdowns(df, threshold_pct=15):
-    """Identify drawdowns, removing duplicates"""
-    df['Running_Max'] = df['Close'].expanding().max()
-    df['Drawdown'] = (df['Close'] - df['Running_Max']) / df['Running_Max'] * 100
-    
-    # Find all troughs below threshold
-    troughs = []
-    i = 0
-    while i < len(df):
-        if df.iloc[i]['Drawdown'] <= -threshold_pct:
-            # Find local minimum in this drawdown
-            start = i
-            while i < len(df) and df.iloc[i]['Drawdown'] <= -threshold_pct * 0.5:
-                i += 1
-            
-            trough_window = df.iloc[start:i+1]
-            trough_idx = trough_window['Drawdown'].idxmin()
-            
-            # Find peak before this trough
-            peak_window = df.iloc[max(0, trough_idx-756):trough_idx]  # Look back up to 3 years
-            peak_idx = peak_window['Close'].idxmax()
-            
-            troughs.append({
-                'peak_date': df.iloc[peak_idx]['Date'],
-                'trough_date': df.iloc[trough_idx]['Date'],
-                'drawdown_pct': df.iloc[trough_idx]['Drawdown'],
-                'peak_idx': peak_idx,
-                'trough_idx': trough_idx
-            })
-        i += 1
-    
-    # Remove duplicates (same trough)
-    seen_troughs = set()
-    unique = []
-    for dd in troughs:
-        if dd['trough_idx'] not in seen_troughs:
-            unique.append(dd)
-            seen_troughs.add(dd['trough_idx'])
-    
-    return unique
-
 def analyze_return_distribution(df, start_idx, end_idx):
     """Analyze return distribution in a period"""
     window = df.iloc[start_idx:end_idx]
@@ -74,8 +35,8 @@ drawdowns = identify_unique_drawdowns(df, threshold_pct=15)
 print(f"Found {len(drawdowns)} unique drawdowns >= 15%\n")
 
 # Exclude exogenous shocks (1987 Black Monday, 2020 COVID)
-exogenous = ['1987', '2020']
-endogenous_dd = [dd for dd in drawdowns if not any(yr in dd['peak_date'].strftime('%Y') for yr in exogenous)]
+exogenous = {1987, 2020}
+endogenous_dd = [dd for dd in drawdowns if dd['peak_date'].year not in exogenous]
 print(f"After excluding 1987 and 2020: {len(endogenous_dd)} drawdowns\n")
 
 # For each drawdown, analyze 6 months before peak
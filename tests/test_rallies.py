@@ -1,80 +1,53 @@
 import sys
 sys.path.append('code/data')
+sys.path.append('code/analysis')
 from load_data import load_asset
+from ccdf_gap import batch_actual_vs_predicted
 import numpy as np
 import pandas as pd
 
-def calculate_alpha(returns, min_return=0.5, min_points=5):
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < min_points:
-        return None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    return -slope, intercept
-
-def measure_actual_vs_predicted(df, start_idx, end_idx, thresholds=[0.5, 1.0, 1.5, 2.0]):
-    gaps = []
-    for i in range(start_idx, end_idx):
-        if i < 60:
-            continue
-        returns = df.iloc[i-60:i]['Return'].values
-        alpha, intercept = calculate_alpha(returns)
-        if alpha is None:
-            continue
-        abs_returns = np.abs(returns)
-        for threshold in thresholds:
-            actual_pct = (abs_returns >= threshold).sum() / len(abs_returns)
-            predicted_pct = np.exp(intercept) * (threshold ** (-alpha))
-            gap = actual_pct - predicted_pct
-            gaps.append(gap)
-    return np.mean(gaps) if len(gaps) > 0 else np.nan
-
 def identify_rallies(df, threshold_pct=10):
     """Identify rallies (inverse of drawdowns)"""
-    df['Running_Min'] = df['Close'].expanding().min()
-    df['Rally'] = (df['Close'] - df['Running_Min']) / df['Running_Min'] * 100
+    close = df['Close'].to_numpy(dtype=np.float64)
+    running_min = np.minimum.accumulate(close)
+    df['Running_Min'] = running_min
+    rally = (close - running_min) / running_min * 100
+    df['Rally'] = rally
+    dates = df['Date'].to_numpy()
     
-    rallies = []
-    i = 0
-    while i < len(df):
-        if df.iloc[i]['Rally'] >= threshold_pct:
-            start = i
-            # Find where rally ends (pullback of 50%)
-            while i < len(df) and df.iloc[i]['Rally'] >= threshold_pct * 0.5:
-                i += 1
-            
-            rally_window = df.iloc[start:i+1]
-            peak_idx = rally_window['Rally'].idxmax()
-            
-            # Find trough before this rally
-            trough_window = df.iloc[max(0, peak_idx-756):peak_idx]
-            trough_idx = trough_window['Close'].idxmin()
-            
-            rallies.append({
-                'trough_date': df.iloc[trough_idx]['Date'],
-                'peak_date': df.iloc[peak_idx]['Date'],
-                'rally_pct': df.iloc[peak_idx]['Rally'],
-                'trough_idx': trough_idx,
-                'peak_idx': peak_idx
-            })
-        i += 1
+    # Entry and exit candidates, found once up front
+    crossed = np.flatnonzero(rally >= threshold_pct)
+    pulled_back = np.flatnonzero(rally < threshold_pct * 0.5)
     
-    # Remove duplicates
-    seen_peaks = set()
-    unique = []
-    for r in rallies:
-        if r['peak_idx'] not in seen_peaks:
-            unique.append(r)
-            seen_peaks.add(r['peak_idx'])
+    # First rally seen for each peak, in scan order
+    rallies = {}
+    i = 0
+    while True:
+        j = np.searchsorted(crossed, i)
+        if j == len(crossed):
+            break
+        start = crossed[j]
+        
+        # Rally ends at the first 50% pullback after entry, or end of data
+        r = np.searchsorted(pulled_back, start)
+        exit_idx = pulled_back[r] if r < len(pulled_back) else len(close)
+        
+        peak_idx = start + int(np.argmax(rally[start:exit_idx+1]))
+        
+        # Find trough before this rally
+        trough_start = max(0, peak_idx-756)
+        trough_idx = trough_start + int(np.argmin(close[trough_start:peak_idx]))
+        
+        rallies.setdefault(peak_idx, {
+            'trough_date': pd.Timestamp(dates[trough_idx]),
+            'peak_date': pd.Timestamp(dates[peak_idx]),
+            'rally_pct': rally[peak_idx],
+            'trough_idx': trough_idx,
+            'peak_idx': peak_idx
+        })
+        i = exit_idx + 1
     
-    return unique
+    return list(rallies.values())
 
 def analyze_asset(filename, asset_name):
     print(f"\nAnalyzing {asset_name}...")
@@ -90,15 +63,14 @@ def analyze_asset(filename, asset_name):
     lead_time = 126
     results = []
     
-    for rally in rallies:
-        trough_idx = rally['trough_idx']
-        
-        if trough_idx < lead_time * 2:
-            continue
-        
-        leadup_gap = measure_actual_vs_predicted(df, trough_idx - lead_time, trough_idx)
-        normal_gap = measure_actual_vs_predicted(df, trough_idx - lead_time * 2, trough_idx - lead_time)
-        
+    # Lead-up and normal spans for every rally, measured in one batch
+    rallies = [r for r in rallies if r['trough_idx'] >= lead_time * 2]
+    troughs = np.array([r['trough_idx'] for r in rallies], dtype=np.int64)
+    leadup_gaps, normal_gaps = batch_actual_vs_predicted(df, np.stack([
+        np.column_stack([troughs - lead_time, troughs]),
+        np.column_stack([troughs - lead_time * 2, troughs - lead_time])]))
+    
+    for rally, leadup_gap, normal_gap in zip(rallies, leadup_gaps, normal_gaps):
         if np.isnan(leadup_gap) or np.isnan(normal_gap):
             continue
         
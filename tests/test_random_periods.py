@@ -1,41 +1,11 @@
 import sys
 sys.path.append('code/data')
+sys.path.append('code/analysis')
 from load_data import load_asset
+from ccdf_gap import batch_actual_vs_predicted
 import numpy as np
 import pandas as pd
 
-def calculate_alpha(returns, min_return=0.5, min_points=5):
-    sorted_returns = np.sort(np.abs(returns))[::-1]
-    n = len(sorted_returns)
-    ccdf = np.arange(1, n+1) / n
-    valid_mask = (sorted_returns > 0) & (ccdf > 0)
-    tail_mask = sorted_returns[valid_mask] > min_return
-    if tail_mask.sum() < min_points:
-        return None, None
-    x = sorted_returns[valid_mask][tail_mask]
-    y = ccdf[valid_mask][tail_mask]
-    log_x = np.log(x)
-    log_y = np.log(y)
-    slope, intercept = np.polyfit(log_x, log_y, 1)
-    return -slope, intercept
-
-def measure_actual_vs_predicted(df, start_idx, end_idx, thresholds=[0.5, 1.0, 1.5, 2.0]):
-    gaps = []
-    for i in range(start_idx, end_idx):
-        if i < 60:
-            continue
-        returns = df.iloc[i-60:i]['Return'].values
-        alpha, intercept = calculate_alpha(returns)
-        if alpha is None:
-            continue
-        abs_returns = np.abs(returns)
-        for threshold in thresholds:
-            actual_pct = (abs_returns >= threshold).sum() / len(abs_returns)
-            predicted_pct = np.exp(intercept) * (threshold ** (-alpha))
-            gap = actual_pct - predicted_pct
-            gaps.append(gap)
-    return np.mean(gaps) if len(gaps) > 0 else np.nan
-
 def analyze_random_periods(filename, asset_name, n_samples=20, seed=42):
     print(f"\nAnalyzing {asset_name}...")
     df = load_asset(filename)
@@ -43,24 +13,30 @@ def analyze_random_periods(filename, asset_name, n_samples=20, seed=42):
     np.random.seed(seed)
     lead_time = 126
     
-    # Pick random indices that have enough history
-    valid_indices = range(lead_time * 2, len(df) - lead_time)
-    if len(valid_indices) < n_samples:
-        n_samples = len(valid_indices)
+    # Pick random indices that have enough history; sampling offsets from an
+    # integer population draws the same days as choosing from the range itself,
+    # without first materializing it as an array
+    first_idx = lead_time * 2
+    n_valid = max(0, len(df) - lead_time - first_idx)
+    if n_valid < n_samples:
+        n_samples = n_valid
     
-    random_indices = np.random.choice(valid_indices, size=n_samples, replace=False)
+    random_indices = first_idx + np.random.choice(n_valid, size=n_samples, replace=False)
     
+    dates = df['Date'].to_numpy()
     results = []
-    for idx in random_indices:
-        leadup_gap = measure_actual_vs_predicted(df, idx - lead_time, idx)
-        normal_gap = measure_actual_vs_predicted(df, idx - lead_time * 2, idx - lead_time)
-        
+    # Lead-up and normal spans for every sampled day, measured in one batch
+    leadup_gaps, normal_gaps = batch_actual_vs_predicted(df, np.stack([
+        np.column_stack([random_indices - lead_time, random_indices]),
+        np.column_stack([random_indices - lead_time * 2, random_indices - lead_time])]))
+    
+    for idx, leadup_gap, normal_gap in zip(random_indices, leadup_gaps, normal_gaps):
         if np.isnan(leadup_gap) or np.isnan(normal_gap):
             continue
         
         results.append({
             'Asset': asset_name,
-            'Date': df.iloc[idx]['Date'].strftime('%Y-%m-%d'),
+            'Date': pd.Timestamp(dates[idx]).strftime('%Y-%m-%d'),
             'Lead-up Gap': f"{leadup_gap:.4f}",
             'Normal Gap': f"{normal_gap:.4f}",
             'Difference': f"{leadup_gap - normal_gap:.4f}",